@@ -0,0 +1,19 @@
+from django.core.cache import cache
+
+
+def version(key):
+    """Current version of a group of cached content. Cache keys which embed it get discarded once it is bumped."""
+    value = cache.get(f'version:{key}')
+    if value is None:
+        cache.add(f'version:{key}', 1, None)
+        value = cache.get(f'version:{key}', 1)
+    return value
+
+
+def bump(*keys):
+    """Invalidates every cached entry built against the current version of the given keys"""
+    for key in keys:
+        try:
+            cache.incr(f'version:{key}')
+        except ValueError:
+            cache.add(f'version:{key}', 1, None)
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import Resolver404, resolve
+from django.utils import translation
+
+from candelabrus import cache
+
+# Headers which a page served from the cache must carry just like the freshly built one
+HEADERS = (
+    'Content-Type',
+    'X-Frame-Options',
+    'X-Content-Type-Options',
+    'Referrer-Policy',
+    'Cross-Origin-Opener-Policy',
+    'Strict-Transport-Security',
+    'Content-Language',
+    'Vary',
+)
+
+
+class Command(BaseCommand):
+    help = 'Checks that cached pages are served with the same security headers as freshly built ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='+', type=str, help='Path of a cached page, such as /en/fons/catalog')
+
+    def handle(self, *args, **options):
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        inconsistent = 0
+        for path in options['path']:
+            # Localized paths only resolve with their own language active
+            try:
+                with translation.override(translation.get_language_from_path(path)):
+                    namespace = resolve(path).namespace
+            except Resolver404:
+                print(f"Unknown path {path}.")
+                exit(-1)
+            cache.bump(f'page:{namespace}')
+            # Separate clients, so that no cookie set by the first response keeps the second out of the cache
+            built = Client().get(path, HTTP_HOST=host, secure=True)
+            cached = Client().get(path, HTTP_HOST=host, secure=True)
+            for header in HEADERS:
+                if built.get(header) != cached.get(header):
+                    inconsistent += 1
+                    print(f"{path}: {header} is {built.get(header)!r} when built "
+                          f"but {cached.get(header)!r} when cached")
+        print(f"{inconsistent} inconsistent headers")
+        if inconsistent:
+            exit(-1)
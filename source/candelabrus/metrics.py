@@ -0,0 +1,174 @@
+"""
+In-process request instrumentation, enabled through settings.METRICS.
+Every request gets a measurement (SQL query count and time, template and Markdown render time), which is then
+recorded into histograms labelled by resolved URL name and language and exported in the Prometheus text format.
+Each worker process keeps its own histograms. When a DIRECTORY is configured, workers periodically dump them there
+so that the export of any worker covers all of them.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Histogram upper bounds, in seconds for the timings and in queries for the query counts
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = {
+    'request_seconds': ('Request latency', SECONDS),
+    'sql_queries': ('SQL queries per request', QUERIES),
+    'sql_seconds': ('SQL time per request', SECONDS),
+    'template_seconds': ('Template render time per request', SECONDS),
+    'markdown_seconds': ('Markdown render time per request', SECONDS),
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+# {(metric, view, language): [bucket counts..., overflow count, sum, count]}
+_histograms = dict()
+_dumped = 0
+
+
+class Measurement:
+    __slots__ = ('started', 'sql_queries', 'sql_seconds', 'template_seconds', 'markdown_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.markdown_seconds = 0.0
+
+
+def current():
+    """Measurement of the request being handled by this thread, if it is being instrumented"""
+    return getattr(_local, 'measurement', None)
+
+
+@contextmanager
+def measuring():
+    _local.measurement = measurement = Measurement()
+    try:
+        yield measurement
+    finally:
+        _local.measurement = None
+
+
+@contextmanager
+def timed(kind):
+    """Adds the time spent within the block to the <kind>_seconds of the current measurement"""
+    measurement = current()
+    if measurement is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(measurement, f'{kind}_seconds', getattr(measurement, f'{kind}_seconds') + time.perf_counter() - started)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing the queries of the current measurement"""
+    measurement = current()
+    if measurement is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measurement.sql_queries += 1
+        measurement.sql_seconds += time.perf_counter() - started
+
+
+def observe(metric, view, language, value):
+    bounds = METRICS[metric][1]
+    with _lock:
+        histogram = _histograms.get((metric, view, language))
+        if histogram is None:
+            histogram = _histograms[(metric, view, language)] = [0] * (len(bounds) + 3)
+        for index, bound in enumerate(bounds):
+            if value <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(bounds)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+def record(measurement, view, language):
+    """Records a finished measurement. Returns its total duration, in seconds."""
+    elapsed = time.perf_counter() - measurement.started
+    observe('request_seconds', view, language, elapsed)
+    observe('sql_queries', view, language, measurement.sql_queries)
+    observe('sql_seconds', view, language, measurement.sql_seconds)
+    observe('template_seconds', view, language, measurement.template_seconds)
+    observe('markdown_seconds', view, language, measurement.markdown_seconds)
+    dump()
+    return elapsed
+
+
+def dump(force=False):
+    """Writes the histograms of this worker to the configured directory, at most once every DUMP_INTERVAL seconds"""
+    global _dumped
+    directory = settings.METRICS.get('DIRECTORY')
+    if not directory or (not force and time.monotonic() - _dumped < settings.METRICS.get('DUMP_INTERVAL', 10)):
+        return
+    _dumped = time.monotonic()
+    with _lock:
+        rows = [[*key, histogram] for key, histogram in _histograms.items()]
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(rows, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def collect():
+    """Histograms of every worker when they are dumped to a directory, otherwise only those of this one"""
+    directory = settings.METRICS.get('DIRECTORY')
+    if not directory:
+        with _lock:
+            return {key: list(histogram) for key, histogram in _histograms.items()}
+
+    dump(force=True)
+    merged = dict()
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as file:
+                rows = json.load(file)
+        except (OSError, ValueError):
+            continue  # Being replaced by its worker
+        for metric, view, language, histogram in rows:
+            if metric not in METRICS:
+                continue
+            total = merged.setdefault((metric, view, language), [0] * len(histogram))
+            for index, value in enumerate(histogram):
+                total[index] += value
+    return merged
+
+
+def export():
+    """Histograms in the Prometheus text exposition format"""
+    histograms = collect()
+    lines = []
+    for metric, (description, bounds) in METRICS.items():
+        name = f'candelabrus_{metric}'
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (key_metric, view, language), histogram in sorted(histograms.items()):
+            if key_metric != metric:
+                continue
+            labels = f'view="{view}",language="{language}"'
+            cumulative = 0
+            for bound, count in zip((*bounds, '+Inf'), histogram):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram[-2]}')
+            lines.append(f'{name}_count{{{labels}}} {histogram[-1]}')
+    return '\n'.join(lines) + '\n'
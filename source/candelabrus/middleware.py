@@ -0,0 +1,106 @@
+import hashlib
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from candelabrus import metrics
+from candelabrus.cache import version
+
+logger = logging.getLogger('candelabrus.metrics')
+
+
+class PageCacheMiddleware:
+    """
+    Serves whole pages of the configured URL namespaces to anonymous visitors from the cache.
+    Pages are stored along with their headers, keyed by namespace version, language and full path.
+    Bumping the 'page:<namespace>' version (which the apps do on every model change) discards the pages of that
+    namespace.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache = caches[settings.PAGE_CACHE.get('CACHE', 'default')]
+        self.namespaces = set(settings.PAGE_CACHE['NAMESPACES'])
+        self.timeout = settings.PAGE_CACHE.get('TIMEOUT', 3600)
+
+    def __call__(self, request):
+        key = self.key(request)
+        if key is None:
+            return self.get_response(request)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            # The middlewares after this one don't run for cached pages, so their headers are replayed
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+            return response
+
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if response.status_code == 200 and not response.streaming and not response.cookies \
+                and not (session is not None and session.accessed):
+            self.cache.set(key, (response.content, list(response.items())), self.timeout)
+        return response
+
+    def key(self, request):
+        """Cache key of the request page, or None if it is not to be cached"""
+        if request.method not in ('GET', 'HEAD') or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        try:
+            namespace = resolve(request.path_info).namespace
+        except Resolver404:
+            return None
+        if namespace not in self.namespaces:
+            return None
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'page:{namespace}:{version(f"page:{namespace}")}:{request.LANGUAGE_CODE}:{path}'
+
+
+class InstrumentationMiddleware:
+    """
+    Measures every request (see candelabrus.metrics) when settings.METRICS is enabled.
+    Requests which go over the query count or latency budgets get logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS.get('ENABLED'):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.query_budget = settings.METRICS.get('QUERY_BUDGET')
+        self.latency_budget = settings.METRICS.get('LATENCY_BUDGET')
+
+    def __call__(self, request):
+        with metrics.measuring() as measurement, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+            response = self.get_response(request)
+        view = self.view_name(request)
+        elapsed = metrics.record(measurement, view, getattr(request, 'LANGUAGE_CODE', ''))
+
+        if self.query_budget is not None and measurement.sql_queries > self.query_budget:
+            logger.warning("%s (%s) made %d SQL queries, over the budget of %d",
+                           request.path, view, measurement.sql_queries, self.query_budget)
+        if self.latency_budget is not None and elapsed > self.latency_budget:
+            logger.warning("%s (%s) took %.3fs, over the budget of %.3fs (%.3fs in SQL, %.3fs rendering templates)",
+                           request.path, view, elapsed, self.latency_budget,
+                           measurement.sql_seconds, measurement.template_seconds)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        """Resolved URL name, also for the requests which never got to their view (e.g. served from cache)"""
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unresolved'
+        return match.view_name
@@ -1,9 +1,21 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.template import loader
 from django.utils import translation
 
+from candelabrus import metrics as request_metrics
+
 
 def index(request):
     translation.activate('pt')
     template = loader.get_template('candelabrus/index.html')
     return HttpResponse(template.render(None, request))
+
+
+def metrics(request):
+    if not settings.METRICS.get('ENABLED'):
+        raise Http404()
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS.get('ALLOWED_ADDRESSES', ()) \
+            and not request.user.is_staff:
+        raise Http404()
+    return HttpResponse(request_metrics.export(), content_type='text/plain; version=0.0.4')
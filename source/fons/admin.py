@@ -1,4 +1,8 @@
+from dal import autocomplete
+from django import forms
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
+from fons import closure
 from fons import models as m
 from django_mptt_admin.admin import DjangoMpttAdmin
 
@@ -17,12 +21,28 @@ class LocalizedEventAdmin(admin.TabularInline):
     model = m.LocalizedEvent
 
 
+class EventDivisionForm(forms.ModelForm):
+    class Meta:
+        model = m.EventDivisions
+        fields = '__all__'
+        widgets = {'division': autocomplete.ModelSelect2(url='location:division-autocomplete')}
+
+
 class EventDivisionAdmin(admin.TabularInline):
     model = m.EventDivisions
+    form = EventDivisionForm
+
+
+class EventSubjectsForm(forms.ModelForm):
+    class Meta:
+        model = m.EventSubjects
+        fields = '__all__'
+        widgets = {'subject': autocomplete.ModelSelect2(url='fons:subject-autocomplete')}
 
 
 class EventSubjectsAdmin(admin.TabularInline):
     model = m.EventSubjects
+    form = EventSubjectsForm
 
 
 class EventAdmin(admin.ModelAdmin):
@@ -33,11 +53,63 @@ class EventAdmin(admin.ModelAdmin):
     ]
 
 
+class SourceProviderForm(forms.ModelForm):
+    class Meta:
+        model = m.SourceProvider
+        fields = '__all__'
+        widgets = {
+            'country': autocomplete.ModelSelect2(url='location:territory-autocomplete'),
+            'parent': autocomplete.ModelSelect2Multiple(url='fons:provider-autocomplete'),
+        }
+
+    def clean_parent(self):
+        parents = self.cleaned_data['parent']
+        if self.instance.pk is not None and closure.would_cycle(self.instance, parents):
+            raise forms.ValidationError('A source provider cannot own one of its owners.')
+        return parents
+
+
+class SourceProviderAdmin(admin.ModelAdmin):
+    form = SourceProviderForm
+
+
+class SourceForm(forms.ModelForm):
+    class Meta:
+        model = m.Source
+        fields = '__all__'
+        widgets = {
+            'language': autocomplete.ModelSelect2(url='location:language-autocomplete'),
+            'provider': autocomplete.ModelSelect2(url='fons:provider-autocomplete'),
+        }
+
+
+class SourceAdmin(admin.ModelAdmin):
+    form = SourceForm
+
+
+class WebpageForm(SourceForm):
+    page_code = forms.CharField(widget=forms.Textarea, required=False, label=_('source code'))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial['page_code'] = self.instance.page_code
+
+    def save(self, commit=True):
+        if self.cleaned_data['page_code'] and 'page_code' in self.changed_data:
+            self.instance.archive(self.cleaned_data['page_code'])
+        return super().save(commit)
+
+
+class WebpageAdmin(SourceAdmin):
+    form = WebpageForm
+
+
 admin.site.register(m.Subject, SubjectAdmin)
 admin.site.register(m.Event, EventAdmin)
-admin.site.register(m.SourceProvider)
-admin.site.register(m.Source)
-admin.site.register(m.Webpage)
-admin.site.register(m.Media)
+admin.site.register(m.SourceProvider, SourceProviderAdmin)
+admin.site.register(m.Source, SourceAdmin)
+admin.site.register(m.Webpage, WebpageAdmin)
+admin.site.register(m.Media, SourceAdmin)
 admin.site.register(m.SourceFlaw)
 admin.site.register(m.Citation)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class FonsConfig(AppConfig):
     name = 'fons'
+
+    def ready(self):
+        from fons import signals  # noqa: F401
@@ -0,0 +1,19 @@
+from fons import models as m
+from location.autocomplete import TrigramAutocomplete
+
+
+class SubjectAutocomplete(TrigramAutocomplete):
+    model = m.Subject
+
+
+class SourceProviderAutocomplete(TrigramAutocomplete):
+    """Source providers, optionally scoped to a territory (id or alpha2)"""
+    model = m.SourceProvider
+
+    def scope(self, queryset):
+        country = self.parameter('country')
+        if country is None:
+            return queryset
+        if str(country).isdigit():
+            return queryset.filter(country_id=country)
+        return queryset.filter(country__alpha2=str(country).upper())
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+
+from candelabrus.cache import version
+from fons import models as m
+
+
+def build(language):
+    """
+    Flattened subject forest, in tree order, with the names in the given language and the event count of each node.
+    Each node tells whether it opens a new nesting level and how many levels close after it.
+    """
+    subjects = m.Subject.objects.order_by('tree_id', 'lft').prefetch_related(Prefetch(
+        'localizations',
+        queryset=m.LocalizedSubject.objects.filter(language__alpha2=language),
+        to_attr='active_localizations'))
+    counts = dict(m.EventSubjects.objects.values_list('subject').annotate(Count('event')))
+
+    nodes = []
+    previous_level = -1
+    for subject in subjects:
+        localized = subject.active_localizations[0] if subject.active_localizations else None
+        level = subject.level
+        if nodes:
+            nodes[-1]['closes'] = range(previous_level - level)
+        nodes.append({
+            'id': subject.id,
+            'name': localized.name if localized else subject.name,
+            'description': localized.description if localized else None,
+            'translated': localized is not None,
+            'events': counts.get(subject.id, 0),
+            'opens': level > previous_level,
+            'closes': range(level + 1),
+        })
+        previous_level = level
+    return nodes
+
+
+def tree(language):
+    """Cached catalog tree, rebuilt whenever the subjects or their events change"""
+    key = f'fons:catalog:{version("fons:catalog")}:{language}'
+    nodes = cache.get(key)
+    if nodes is None:
+        nodes = build(language)
+        cache.set(key, nodes, None)
+    return nodes
@@ -0,0 +1,90 @@
+"""
+Maintenance of the source provider ownership closure (fons.models.ProviderLink).
+Whenever an ownership edge changes, the ancestors of the affected providers and of everything they own get
+recomputed, which leaves the rest of the graph untouched.
+"""
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from fons import models as m
+
+# Walks up the ownership edges of the given providers. Chains which would revisit a provider are cut.
+_ANCESTORS_SQL = """
+WITH RECURSIVE chain(descendant_id, ancestor_id, distance, visited) AS (
+    SELECT edge.from_sourceprovider_id, edge.to_sourceprovider_id, 1, ARRAY[edge.from_sourceprovider_id]
+    FROM fons_sourceprovider_parent edge
+    WHERE edge.from_sourceprovider_id = ANY(%s)
+  UNION ALL
+    SELECT chain.descendant_id, edge.to_sourceprovider_id, chain.distance + 1, chain.visited || chain.ancestor_id
+    FROM chain
+    JOIN fons_sourceprovider_parent edge ON edge.from_sourceprovider_id = chain.ancestor_id
+    WHERE NOT edge.to_sourceprovider_id = ANY(chain.visited || chain.ancestor_id)
+)
+INSERT INTO fons_providerlink (ancestor_id, descendant_id, distance)
+SELECT ancestor_id, descendant_id, MIN(distance)
+FROM chain
+GROUP BY ancestor_id, descendant_id
+"""
+
+_SELF_LINKS_SQL = """
+INSERT INTO fons_providerlink (ancestor_id, descendant_id, distance)
+SELECT provider.id, provider.id, 0
+FROM fons_sourceprovider provider
+WHERE provider.id = ANY(%s)
+ON CONFLICT (ancestor_id, descendant_id) DO NOTHING
+"""
+
+
+def would_cycle(child, parents):
+    """Whether making the parents own the child would close an ownership cycle"""
+    return m.ProviderLink.objects.filter(ancestor=child, descendant__in=parents).exists()
+
+
+def refresh(providers):
+    """Recomputes the ancestors of the given providers and of every provider they own"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_SELF_LINKS_SQL, [list(providers)])
+        affected = list(m.ProviderLink.objects
+                        .filter(ancestor__in=providers)
+                        .values_list('descendant_id', flat=True)
+                        .distinct())
+        m.ProviderLink.objects.filter(descendant__in=affected, distance__gt=0).delete()
+        cursor.execute(_ANCESTORS_SQL, [affected])
+
+
+def rebuild():
+    with transaction.atomic():
+        m.ProviderLink.objects.all().delete()
+        refresh(list(m.SourceProvider.objects.values_list('id', flat=True)))
+
+
+def on_provider_saved(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        m.ProviderLink.objects.create(ancestor=instance, descendant=instance, distance=0)
+
+
+def on_provider_pre_delete(instance, **kwargs):
+    # Deleting the provider cascades over its ownership edges without signalling them
+    instance._closure_descendants = list(m.ProviderLink.objects
+                                         .filter(ancestor=instance, distance__gt=0)
+                                         .values_list('descendant_id', flat=True))
+
+
+def on_provider_deleted(instance, **kwargs):
+    if instance._closure_descendants:
+        refresh(instance._closure_descendants)
+
+
+def on_ownership_changed(instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_add':
+        if reverse:
+            cycle = m.ProviderLink.objects.filter(ancestor__in=pk_set, descendant=instance).exists()
+        else:
+            cycle = would_cycle(instance, pk_set)
+        if cycle:
+            raise ValidationError('A source provider cannot own one of its owners.')
+    elif action in ('post_add', 'post_remove'):
+        refresh(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        # Whatever the instance used to own is still among its closure descendants at this point
+        refresh([instance.pk])
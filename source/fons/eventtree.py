@@ -0,0 +1,21 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from candelabrus.cache import version
+from fons import models as m
+
+
+def descendants(root, max_depth=None):
+    """
+    Cached flat tree of the events nested under root, with their localizations, as by EventQuerySet.descendants().
+    Trees get discarded whenever an event nesting, an event or an event translation changes.
+    """
+    root = getattr(root, 'pk', root)
+    key = f'fons:event-tree:{version("fons:event-tree")}:{root}:{max_depth}'
+    tree = cache.get(key)
+    if tree is None:
+        tree = list(m.Event.objects.descendants(root, max_depth).prefetch_related(Prefetch(
+            'localizations',
+            queryset=m.LocalizedEvent.objects.select_related('language'))))
+        cache.set(key, tree, None)
+    return tree
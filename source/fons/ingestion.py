@@ -0,0 +1,175 @@
+"""
+Bulk citation ingestion.
+Records are streamed and written in batches: each batch resolves its sources, skips the citations which already
+exist (same source and normalized content) and bulk inserts the rest along with their event links and search entries.
+Malformed records are rejected as they are read, so that they never abort an import halfway.
+"""
+import csv
+import json
+from collections import Counter, OrderedDict, namedtuple
+
+from django.db import transaction
+
+from fons import models as m
+from search import index
+
+CitationRecord = namedtuple('CitationRecord', 'url isbn ismn isan author content events')
+
+# Source identifiers, in lookup order, along with the model which holds them
+IDENTIFIERS = (('isbn', m.Media), ('ismn', m.Media), ('isan', m.Media), ('url', m.Source))
+AUTHOR_LENGTH = m.Citation._meta.get_field('author').max_length
+
+
+def record(fields):
+    """
+    Record out of a mapping, with events either as a list or as a space/comma separated string.
+    Raises ValueError when the fields do not make up a valid citation.
+    """
+    if not isinstance(fields, dict):
+        raise ValueError("not an object")
+    content = fields.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("no content")
+    author = fields.get('author') or ''
+    if not isinstance(author, str) or len(author) > AUTHOR_LENGTH:
+        raise ValueError(f"the author must be a text of up to {AUTHOR_LENGTH} characters")
+    events = fields.get('events') or []
+    if isinstance(events, str):
+        events = events.replace(',', ' ').split()
+    if not isinstance(events, list):
+        raise ValueError("events must be a list of event ids")
+    try:
+        events = [int(event) for event in events]
+    except (TypeError, ValueError):
+        raise ValueError(f"bad event ids: {events!r}") from None
+    identifiers = {
+        identifier: str(fields[identifier]) if fields.get(identifier) else None
+        for identifier, _ in IDENTIFIERS}
+    if not any(identifiers.values()):
+        raise ValueError("no source identifier")
+    return CitationRecord(author=author, content=content, events=events, **identifiers)
+
+
+def read_jsonl(file, rejected):
+    """Records of a JSON Lines file. Malformed lines are appended to rejected as (line number, reason) pairs."""
+    for number, line in enumerate(file, 1):
+        if line.strip():
+            try:
+                yield record(json.loads(line))
+            except ValueError as error:
+                rejected.append((number, str(error)))
+
+
+def read_csv(file, rejected):
+    """Records of a CSV file. Malformed rows are appended to rejected as (line number, reason) pairs."""
+    reader = csv.DictReader(file)
+    for row in reader:
+        try:
+            yield record(row)
+        except ValueError as error:
+            rejected.append((reader.line_num, str(error)))
+
+
+def backfill_hashes(batch_size=1000):
+    """Hashes the content of the citations stored without one. Returns the amount of hashed citations."""
+    count = 0
+    batch = []
+    citations = m.Citation.objects.filter(content_hash='').only('id', 'content').iterator(chunk_size=batch_size)
+    for citation in citations:
+        citation.content_hash = m.citation_hash(citation.content)
+        batch.append(citation)
+        if len(batch) >= batch_size:
+            m.Citation.objects.bulk_update(batch, ['content_hash'])
+            count += len(batch)
+            batch = []
+    m.Citation.objects.bulk_update(batch, ['content_hash'])
+    return count + len(batch)
+
+
+class SourceResolver:
+    """Resolves source identifiers to source ids, remembering (a bounded amount of) previous lookups"""
+
+    def __init__(self, size=100000):
+        self.size = size
+        self.known = OrderedDict()
+
+    def prefetch(self, records):
+        """Looks up every identifier of the records which is not known yet, with a query per identifier type"""
+        for identifier, model in IDENTIFIERS:
+            values = {getattr(entry, identifier) for entry in records} - {None}
+            missing = [value for value in values if (identifier, value) not in self.known]
+            if not missing:
+                continue
+            found = dict(model.objects.filter(**{f'{identifier}__in': missing}).values_list(identifier, 'pk'))
+            for value in missing:
+                self.remember((identifier, value), found.get(value))
+
+    def remember(self, key, source_id):
+        self.known[key] = source_id
+        if len(self.known) > self.size:
+            self.known.popitem(last=False)
+
+    def resolve(self, entry):
+        for identifier, _ in IDENTIFIERS:
+            value = getattr(entry, identifier)
+            if value is not None and self.known.get((identifier, value)) is not None:
+                return self.known[(identifier, value)]
+        return None
+
+
+def ingest_batch(records, resolver, stats):
+    resolver.prefetch(records)
+    citations = OrderedDict()  # (source, content hash) -> (citation, events)
+    for entry in records:
+        source_id = resolver.resolve(entry)
+        if source_id is None:
+            stats['unresolved'] += 1
+            continue
+        key = (source_id, m.citation_hash(entry.content))
+        if key in citations:
+            stats['duplicated'] += 1
+            citations[key][1].update(entry.events)
+        else:
+            citation = m.Citation(source_id=source_id, content=entry.content, content_hash=key[1], author=entry.author)
+            citations[key] = (citation, set(entry.events))
+    if not citations:
+        return
+
+    with transaction.atomic():
+        existing = m.Citation.objects \
+            .filter(source_id__in={source_id for source_id, _ in citations},
+                    content_hash__in={content_hash for _, content_hash in citations}) \
+            .values_list('source_id', 'content_hash', 'id')
+        for source_id, content_hash, identifier in existing:
+            if (source_id, content_hash) in citations:
+                citations[(source_id, content_hash)][0].id = identifier
+                stats['duplicated'] += 1
+        new = [citation for citation, _ in citations.values() if citation.id is None]
+        m.Citation.objects.bulk_create(new)
+        # Bulk inserts do not signal the search index
+        index.index_many(m.Citation, [citation.id for citation in new])
+        stats['created'] += len(new)
+
+        events = set(m.Event.objects
+                     .filter(id__in={event for _, citation_events in citations.values() for event in citation_events})
+                     .values_list('id', flat=True))
+        links = [
+            m.Event.source_citations.through(event_id=event, citation_id=citation.id)
+            for citation, citation_events in citations.values() for event in citation_events if event in events]
+        m.Event.source_citations.through.objects.bulk_create(links, ignore_conflicts=True)
+        stats['links'] += len(links)
+
+
+def ingest(records, batch_size=1000):
+    """Ingests an iterable of CitationRecord. Returns a Counter with the outcome."""
+    stats = Counter()
+    resolver = SourceResolver()
+    batch = []
+    for entry in records:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            ingest_batch(batch, resolver, stats)
+            batch = []
+    if batch:
+        ingest_batch(batch, resolver, stats)
+    return stats
@@ -0,0 +1,43 @@
+import os
+from django.core.management.base import BaseCommand
+from fons import ingestion
+
+
+class Command(BaseCommand):
+    help = 'Imports citations from a JSON Lines or a CSV file ' \
+           '(fields: url, isbn, ismn, isan, author, content, events)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='*', type=str)
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First hash the stored citations which have no content hash, so that duplicates of them are detected')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            print(f"{ingestion.backfill_hashes(options['batch_size'])} stored citations hashed")
+            if not options['file']:
+                return
+        elif not options['file']:
+            print("No file given.")
+            exit(-1)
+
+        file = options['file'][0]
+        file_format = options['format'] or ('csv' if file.endswith('.csv') else 'jsonl')
+
+        if not os.path.isfile(file):
+            print("Bad file path.")
+            exit(-1)
+
+        rejected = []
+        with open(file, newline='') as file:
+            read = ingestion.read_csv if file_format == 'csv' else ingestion.read_jsonl
+            stats = ingestion.ingest(read(file, rejected), options['batch_size'])
+
+        for line, reason in rejected:
+            print(f"Line {line} skipped: {reason}")
+        print(f"{stats['created']} citations created, {stats['duplicated']} duplicated, "
+              f"{stats['unresolved']} with an unknown source, {len(rejected)} malformed, {stats['links']} event links")
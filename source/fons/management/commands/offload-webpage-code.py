@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fons import models as m
+
+
+class Command(BaseCommand):
+    help = 'Moves the source code stored in webpage rows into compressed page snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        # The default manager defers the code, which only() would not bring back
+        webpages = m.Webpage._base_manager \
+            .filter(code__isnull=False) \
+            .order_by('pk') \
+            .only('pk', 'code', 'snapshot')
+        last_pk = 0
+        moved = 0
+        while True:
+            chunk = list(webpages.filter(pk__gt=last_pk)[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            with transaction.atomic():
+                for webpage in chunk:
+                    if webpage.code:
+                        webpage.archive(webpage.code)
+                    else:
+                        webpage.code = None
+                m.Webpage.objects.bulk_update(chunk, ['snapshot', 'code'])
+            moved += len(chunk)
+            print(f"{moved} webpages offloaded")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fons import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the event histogram rollups from every event and its subjects and divisions. ' \
+           'Needed after moving a subject or a division under another parent, and after bulk queryset changes.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rollups.rebuild()
+        print(f"{count} event rollups rebuilt")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from fons import closure
+from fons import models as m
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the source provider ownership closure from scratch'
+
+    def handle(self, *args, **options):
+        closure.rebuild()
+        print(f"{m.ProviderLink.objects.count()} provider links")
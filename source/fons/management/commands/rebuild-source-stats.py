@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fons import models as m
+from fons import stats
+
+_FIELDS = ('flaws', 'verified_flaws', 'by_flaw', 'by_fallacy')
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the source and provider credibility statistics from every source flaw'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report the statistics which are inconsistent')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            sources, providers = stats.compute()
+            if options['check']:
+                self.check_model(m.SourceStats, sources, _FIELDS)
+                self.check_model(m.ProviderStats, providers, _FIELDS + ('sources',))
+                return
+            m.SourceStats.objects.all().delete()
+            m.ProviderStats.objects.all().delete()
+            m.SourceStats.objects.bulk_create(sources.values(), batch_size=1000)
+            m.ProviderStats.objects.bulk_create(providers.values(), batch_size=1000)
+        print(f"Statistics of {len(sources)} sources and {len(providers)} providers rebuilt")
+
+    @staticmethod
+    def check_model(model, expected, fields):
+        stored = {stats.pk: stats for stats in model.objects.all()}
+        inconsistent = 0
+        for key in expected.keys() | stored.keys():
+            empty = model()
+            current, correct = stored.get(key, empty), expected.get(key, empty)
+            if any(getattr(current, field) != getattr(correct, field) for field in fields):
+                inconsistent += 1
+                print(f"{model._meta.verbose_name} #{key} is inconsistent")
+        print(f"{inconsistent} inconsistent {model._meta.verbose_name_plural}")
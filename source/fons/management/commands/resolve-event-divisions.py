@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fons import models as m
+from location import geo
+
+
+class Command(BaseCommand):
+    help = 'Links every event with a location to the deepest territorial division which contains it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--all', action='store_true', help='Also resolve events which already have divisions')
+
+    def handle(self, *args, **options):
+        events = m.Event.objects.filter(location__isnull=False).order_by('id').only('id', 'location')
+        if not options['all']:
+            events = events.filter(divisions=None)
+
+        last_id = 0
+        linked = 0
+        unresolved = 0
+        while True:
+            chunk = list(events.filter(id__gt=last_id)[:options['chunk_size']])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            links = []
+            for event, divisions in zip(chunk, geo.resolve_many(event.location for event in chunk)):
+                if divisions:
+                    links.append(m.EventDivisions(event=event, division=divisions[0]))
+                else:
+                    unresolved += 1
+            with transaction.atomic():
+                m.EventDivisions.objects.bulk_create(links, ignore_conflicts=True)
+            linked += len(links)
+            print(f"Resolved events up to #{last_id}")
+
+        print(f"{linked} events linked, {unresolved} outside of every known division")
@@ -1,14 +1,69 @@
+import gzip
+import hashlib
+import unicodedata
+from datetime import timezone
+
 from django.contrib.gis.db import models as gis
+from django.contrib.gis.measure import D
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GistIndex
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.db import models as djm
+from django.db import transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import functions as f
 from django.utils.translation import gettext_lazy as _
 from django.utils import translation as t
 from mptt import models as mptt
+from mptt.managers import TreeManager
+from mptt.querysets import TreeQuerySet
 
 from location import models as location
 from nietz import models as nietz
 
 
+class LocalizedQuerySet(djm.QuerySet):
+    """Queryset of a model translated through a 'localizations' relation"""
+
+    def with_localizations(self):
+        """
+        Loads the translations of every row (and their languages) with a single extra query.
+        Both the translation to any language and the list of available languages are then read from it.
+        """
+        localization = self.model._meta.get_field('localizations').related_model
+        return self.prefetch_related(
+            djm.Prefetch('localizations', queryset=localization.objects.select_related('language')))
+
+
+class Localizable:
+    """Translation accessors which read from the with_localizations() cache when it is present"""
+
+    @property
+    def prefetched_localizations(self):
+        return getattr(self, '_prefetched_objects_cache', {}).get('localizations')
+
+    def localization(self, language):
+        prefetched = self.prefetched_localizations
+        if prefetched is None:
+            return self.localizations.filter(language__alpha2=language).first()
+        return next((localization for localization in prefetched if localization.language.alpha2 == language), None)
+
+    @property
+    def localized(self):
+        return self.localization(t.get_language())
+
+
+class SourceProviderQuerySet(djm.QuerySet):
+    def under(self, provider):
+        """Providers owned by the given one, at any distance (including itself)"""
+        return self.filter(ancestor_links__ancestor=provider)
+
+    def owners_of(self, provider):
+        """Providers which own the given one, at any distance (including itself)"""
+        return self.filter(descendant_links__descendant=provider)
+
+
 class SourceProvider(djm.Model):
     """
     A source provider is an entity that collects information.
@@ -31,12 +86,35 @@ class SourceProvider(djm.Model):
     homepage = djm.URLField(null=True, blank=True, verbose_name=_('homepage'))
     governmental = djm.BooleanField(null=True, blank=True, verbose_name=_('governmental'))
 
+    objects = SourceProviderQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name = _('source provider')
         verbose_name_plural = _('source providers')
+        indexes = [location.trigram_index('name', 'fons_sourceprovider_name_trgm')]
+
+
+class ProviderLink(djm.Model):
+    """
+    Transitive closure of the source provider ownership graph, maintained by fons.closure.
+    Every provider is linked to itself with a distance of 0.
+    """
+    ancestor = djm.ForeignKey(SourceProvider, on_delete=djm.CASCADE, related_name='descendant_links')
+    descendant = djm.ForeignKey(SourceProvider, on_delete=djm.CASCADE, related_name='ancestor_links')
+    distance = djm.IntegerField()  # Length of the shortest ownership chain
+
+    class Meta:
+        unique_together = (('ancestor', 'descendant'),)
+        indexes = [djm.Index(fields=['descendant', 'ancestor'], name='fons_providerlink_up_idx')]
+
+
+class SourceQuerySet(djm.QuerySet):
+    def published_under(self, provider):
+        """Sources published by the given provider or by any provider it owns"""
+        return self.filter(provider__ancestor_links__ancestor=provider)
 
 
 class Source(djm.Model):
@@ -46,12 +124,20 @@ class Source(djm.Model):
     title = djm.CharField(max_length=256, verbose_name=_('title'))
     language = djm.ForeignKey(location.Language, on_delete=djm.PROTECT, verbose_name=_('language'))
     description = djm.TextField(verbose_name=_('description'))  # In the source language
-    url = djm.URLField(null=True, blank=True, verbose_name=_('address'))  # When has an online resource
+    # When has an online resource. Indexed for the lookups of the citation ingestion.
+    url = djm.URLField(null=True, blank=True, db_index=True, verbose_name=_('address'))
     provider = djm.ForeignKey(SourceProvider, on_delete=djm.PROTECT, verbose_name=_('provider'))
 
+    objects = SourceQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # The provider statistics get updated by signals, within this same transaction (see fons.stats)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('source')
         verbose_name_plural = _('sources')
@@ -61,6 +147,49 @@ def webpage_screenshot_img_path(webpage, filename):
     return f'fo/webpage/{webpage.id}/screenshot.{filename.split(".")[-1]}'
 
 
+def page_snapshot_path(snapshot, filename):
+    return f'fo/snapshot/{snapshot.digest[:2]}/{snapshot.digest}.html.gz'
+
+
+class PageSnapshot(djm.Model):
+    """
+    Gzip compressed source code of a web page, kept in the media storage.
+    Snapshots are addressed by the hash of their content, so identical pages share a single snapshot.
+    """
+    digest = djm.CharField(max_length=64, primary_key=True)  # SHA-256 of the uncompressed code
+    file = djm.FileField(upload_to=page_snapshot_path)
+    size = djm.IntegerField()  # Uncompressed size in bytes
+
+    def __str__(self):
+        return self.digest
+
+    @staticmethod
+    def store(code):
+        """Snapshot with the given code, which is only written if no identical one exists"""
+        content = code.encode()
+        digest = hashlib.sha256(content).hexdigest()
+        snapshot = PageSnapshot.objects.filter(digest=digest).first()
+        if snapshot is None:
+            snapshot = PageSnapshot(digest=digest, size=len(content))
+            snapshot.file.save('snapshot.html.gz', ContentFile(gzip.compress(content)), save=False)
+            snapshot.save()
+        return snapshot
+
+    def open(self):
+        """Binary stream of the uncompressed code"""
+        return gzip.open(self.file.open('rb'))
+
+    def read(self):
+        with self.open() as stream:
+            return stream.read().decode()
+
+
+class WebpageManager(djm.Manager.from_queryset(SourceQuerySet)):
+    def get_queryset(self):
+        # Pages which were not offloaded yet still have their code in the row
+        return super().get_queryset().defer('code')
+
+
 class Webpage(Source):
     """
     Online page source.
@@ -70,7 +199,27 @@ class Webpage(Source):
         upload_to=webpage_screenshot_img_path,
         verbose_name=_('screenshot'))
     paywalled = djm.BooleanField(null=True, verbose_name=_('paywalled'))
-    code = djm.TextField(null=True, blank=True, verbose_name=_('source code'))  # Web page source code
+    snapshot = djm.ForeignKey(
+        PageSnapshot,
+        on_delete=djm.PROTECT,
+        null=True, blank=True,
+        editable=False,
+        verbose_name=_('snapshot'))
+    # Legacy in-row source code, moved into snapshots by the offload-webpage-code command
+    code = djm.TextField(null=True, blank=True, editable=False, verbose_name=_('source code'))
+
+    objects = WebpageManager()
+
+    @property
+    def page_code(self):
+        """Web page source code, read from the storage only when requested"""
+        if self.snapshot_id is not None:
+            return self.snapshot.read()
+        return self.code
+
+    def archive(self, code):
+        self.snapshot = PageSnapshot.store(code)
+        self.code = None
 
     class Meta:
         verbose_name = _('webpage')
@@ -136,34 +285,113 @@ class SourceFlaw(djm.Model):
     def __str__(self):
         return self.flaw
 
+    def save(self, *args, **kwargs):
+        # The credibility statistics get updated by signals, within this same transaction (see fons.stats)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('source flaw')
         verbose_name_plural = _('source flaws')
 
 
+class FlawCounts(djm.Model):
+    """Flaw counters, split by flaw type and by fallacy. Breakdowns map each key to [unverified, verified]."""
+    flaws = djm.IntegerField(default=0, verbose_name=_('flaws'))
+    verified_flaws = djm.IntegerField(default=0, verbose_name=_('verified flaws'))
+    by_flaw = djm.JSONField(default=dict)
+    by_fallacy = djm.JSONField(default=dict)
+
+    def count(self, flaw, fallacy_id, verified, amount):
+        self.flaws += amount
+        if verified:
+            self.verified_flaws += amount
+        for breakdown, key in ((self.by_flaw, flaw or ''), (self.by_fallacy, fallacy_id)):
+            if key is None:
+                continue
+            counts = breakdown.setdefault(str(key), [0, 0])
+            counts[int(verified)] += amount
+            if counts == [0, 0]:
+                del breakdown[str(key)]
+
+    def merge(self, other, sign):
+        """Adds (or subtracts, with a negative sign) the counters of another set of counts"""
+        self.flaws += sign * other.flaws
+        self.verified_flaws += sign * other.verified_flaws
+        for breakdown, other_breakdown in ((self.by_flaw, other.by_flaw), (self.by_fallacy, other.by_fallacy)):
+            for key, (unverified, verified) in other_breakdown.items():
+                counts = breakdown.setdefault(key, [0, 0])
+                counts[0] += sign * unverified
+                counts[1] += sign * verified
+                if counts == [0, 0]:
+                    del breakdown[key]
+
+    class Meta:
+        abstract = True
+
+
+class SourceStats(FlawCounts):
+    source = djm.OneToOneField(Source, on_delete=djm.CASCADE, primary_key=True, related_name='stats')
+
+    class Meta:
+        verbose_name = _('source statistics')
+        verbose_name_plural = _('source statistics')
+
+
+class ProviderStats(FlawCounts):
+    provider = djm.OneToOneField(SourceProvider, on_delete=djm.CASCADE, primary_key=True, related_name='stats')
+    sources = djm.IntegerField(default=0, verbose_name=_('sources'))
+    # Verified flaws per source, which providers get ranked by
+    verified_flaw_rate = djm.FloatField(default=0, db_index=True, verbose_name=_('verified flaw rate'))
+
+    def save(self, *args, **kwargs):
+        self.verified_flaw_rate = self.verified_flaws / self.sources if self.sources else 0
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = _('provider statistics')
+        verbose_name_plural = _('provider statistics')
+
+
+def citation_hash(content):
+    """Hash of a citation content which disregards differences in case, whitespace and unicode normalization"""
+    normalized = ' '.join(unicodedata.normalize('NFKC', content).casefold().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
 class Citation(djm.Model):
     source = djm.ForeignKey(Source, on_delete=djm.CASCADE, verbose_name=_('source'))
     content = djm.TextField(verbose_name=_('content'))  # The content which is relevant in this source
+    content_hash = djm.CharField(max_length=64, editable=False)  # Identifies duplicated citations
     author = djm.CharField(max_length=128, verbose_name=_('author'))
 
     def __str__(self):
         return f"Citation of {self.source}"
 
+    def save(self, *args, **kwargs):
+        self.content_hash = citation_hash(self.content)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('citation')
         verbose_name_plural = _('citations')
+        indexes = [djm.Index(fields=['source', 'content_hash'], name='fons_citation_hash_idx')]
+
+
+class SubjectQuerySet(LocalizedQuerySet, TreeQuerySet):
+    pass
 
 
-class Subject(mptt.MPTTModel):
+class Subject(Localizable, mptt.MPTTModel):
     name = djm.CharField(max_length=32, verbose_name=_('name'))  # Default english name
     parent = mptt.TreeForeignKey('self', on_delete=djm.CASCADE, null=True, blank=True, related_name='children')
 
-    @property
-    def localized(self):
-        return self.localizations.filter(language__alpha2=t.get_language()).first()
+    objects = TreeManager.from_queryset(SubjectQuerySet)()
 
     @property
     def languages(self):
+        if self.prefetched_localizations is not None:
+            return [localization.language for localization in self.prefetched_localizations]
         return location.Language.objects.filter(localizedsubject__subject=self)
 
     def __str__(self):
@@ -173,6 +401,7 @@ class Subject(mptt.MPTTModel):
         verbose_name = _('subject')
         verbose_name_plural = _('subjects')
         unique_together = (('name', 'parent'),)
+        indexes = [location.trigram_index('name', 'fons_subject_name_trgm')]
 
 
 class LocalizedSubject(djm.Model):
@@ -193,9 +422,104 @@ class LocalizedSubject(djm.Model):
         unique_together = (('subject', 'language'),)
 
 
-class Event(djm.Model):
+def anniversary(field):
+    """(Month, day) of a date time, in UTC as the expression index requires an immutable expression"""
+    return f.ExtractMonth(field, tzinfo=timezone.utc), f.ExtractDay(field, tzinfo=timezone.utc)
+
+
+class KNNDistance(djm.Func):
+    """PostGIS distance operator (<->), which lets ORDER BY walk the GiST index of the left hand side"""
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = djm.FloatField()
+
+
+# Walks the event children graph from a root, down (descendants) or up (ancestors).
+# Every row carries its depth and the path of ids from the root. Chains which would revisit an event are cut.
+_EVENT_TREE_SQL = """
+WITH RECURSIVE tree(id, depth, path) AS (
+    SELECT edge.{next}, 1, ARRAY[edge.{current}, edge.{next}]
+    FROM fons_event_children edge
+    WHERE edge.{current} = %(root)s
+  UNION ALL
+    SELECT edge.{next}, tree.depth + 1, tree.path || edge.{next}
+    FROM tree
+    JOIN fons_event_children edge ON edge.{current} = tree.id
+    WHERE NOT edge.{next} = ANY(tree.path)
+      AND (CAST(%(max_depth)s AS integer) IS NULL OR tree.depth < CAST(%(max_depth)s AS integer))
+)
+SELECT event.*, tree.depth, tree.path
+FROM tree
+JOIN fons_event event ON event.id = tree.id
+ORDER BY {order}
+"""
+
+
+class EventQuerySet(LocalizedQuerySet):
+    def descendants(self, root, max_depth=None):
+        """
+        Every event nested under root (up to max_depth levels), in depth first order, annotated with depth and path.
+        Events reachable through several parents show up once under each. This ignores any previous filtering.
+        """
+        return self.raw(
+            _EVENT_TREE_SQL.format(current='from_event_id', next='to_event_id', order='tree.path'),
+            {'root': getattr(root, 'pk', root), 'max_depth': max_depth})
+
+    def ancestors(self, root, max_depth=None):
+        """Every event which root is nested under, closest first, annotated like descendants()"""
+        return self.raw(
+            _EVENT_TREE_SQL.format(current='to_event_id', next='from_event_id', order='tree.depth, tree.path'),
+            {'root': getattr(root, 'pk', root), 'max_depth': max_depth})
+
+    def under_subject(self, subject):
+        """Events of the subject or of any subject under it"""
+        return self.filter(djm.Exists(EventSubjects.objects.filter(
+            event=djm.OuterRef('pk'),
+            subject__tree_id=subject.tree_id,
+            subject__lft__gte=subject.lft,
+            subject__rght__lte=subject.rght)))
+
+    def nearest(self, point, limit=10, max_distance=None):
+        """
+        The events closest to point, annotated with their distance in meters.
+        They're found by the location index (KNN), optionally without going further than max_distance meters.
+        """
+        events = self.filter(location__isnull=False)
+        if max_distance is not None:
+            events = events.filter(location__dwithin=(point, D(m=max_distance)))
+        return events \
+            .annotate(distance=KNNDistance('location', djm.Value(point, output_field=gis.PointField(geography=True)))) \
+            .order_by('distance')[:limit]
+
+    def overlapping(self, start, end=None):
+        """Events which were ongoing at some point between start and end (open ended when end is None)"""
+        return self.filter(period__overlap=DateTimeTZRange(start, end, '[]'))
+
+    def during(self, instant):
+        """Events which were ongoing at the given instant"""
+        return self.filter(period__contains=instant)
+
+    def within(self, start, end):
+        """Events which started and ended between start and end"""
+        return self.filter(period__contained_by=DateTimeTZRange(start, end, '[]'))
+
+    def on_this_day(self, month, day):
+        """Events which started in the given day of any year"""
+        event_month, event_day = anniversary('start')
+        return self.annotate(start_month=event_month, start_day=event_day).filter(start_month=month, start_day=day)
+
+
+class Event(Localizable, djm.Model):
     start = djm.DateTimeField(verbose_name=_('start'))
     end = djm.DateTimeField(null=True, blank=True, verbose_name=_('end'))
+    # Time range of the event. Instantaneous when there is no end.
+    period = djm.GeneratedField(
+        expression=djm.Func(
+            djm.F('start'), f.Coalesce(djm.F('end'), djm.F('start')), djm.Value('[]'),
+            function='tstzrange',
+            output_field=DateTimeRangeField()),
+        output_field=DateTimeRangeField(),
+        db_persist=True)
     children = djm.ManyToManyField('self', symmetrical=False, blank=True, verbose_name=_('children'))
     source_citations = djm.ManyToManyField(Citation, blank=True, verbose_name=_('citations'))
     divisions = djm.ManyToManyField(
@@ -212,20 +536,35 @@ class Event(djm.Model):
         verbose_name=_('events'),
         blank=True)
 
+    objects = EventQuerySet.as_manager()
+
     def __str__(self):
         return f"Event from {self.start} to {self.end}"
 
-    @property
-    def localized(self):
-        return self.localizations.filter(language__alpha2=t.get_language()).first()
+    def save(self, *args, **kwargs):
+        # The rollups of the event are updated by its save signals, and must commit along with it
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def clean(self):
+        super().clean()
+        if self.end is not None and self.end < self.start:
+            raise ValidationError(_('An event cannot end before it starts.'))
 
     @property
     def languages(self):
+        if self.prefetched_localizations is not None:
+            return [localization.language for localization in self.prefetched_localizations]
         return location.Language.objects.filter(localizedevent__event=self)
 
     class Meta:
         verbose_name = _('event')
         verbose_name_plural = _('events')
+        indexes = [
+            djm.Index(fields=['start', 'id'], name='fons_event_timeline_idx'),
+            GistIndex(fields=['period'], name='fons_event_period_idx'),
+            djm.Index(*anniversary('start'), name='fons_event_anniversary_idx'),
+        ]
 
 
 class EventSubjects(djm.Model):
@@ -236,6 +575,10 @@ class EventSubjects(djm.Model):
     def __str__(self):
         return f"{self.event} to {self.subject}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('event subject')
         verbose_name_plural = _('event subjects')
@@ -250,6 +593,10 @@ class EventDivisions(djm.Model):
     def __str__(self):
         return f"{self.event} to {self.division}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('event territorial division')
         verbose_name_plural = _('event territorial divisions')
@@ -269,3 +616,60 @@ class LocalizedEvent(djm.Model):
         verbose_name = _('event translation')
         verbose_name_plural = _('event translations')
         unique_together = (('event', 'language'),)
+
+
+class RollupGranularity:
+    MONTH = 0
+    YEAR = 1
+
+    CHOICES = (
+        (MONTH, _('month')),
+        (YEAR, _('year')),
+    )
+
+    # PostgreSQL date_trunc units
+    UNITS = {
+        MONTH: 'month',
+        YEAR: 'year',
+    }
+
+    @classmethod
+    def bucket(cls, granularity, moment):
+        moment = moment.astimezone(timezone.utc).date()
+        return moment.replace(day=1) if granularity == cls.MONTH else moment.replace(month=1, day=1)
+
+
+class EventRollup(djm.Model):
+    """
+    Amount of events which started within a time bucket, by subject and territorial division.
+    Events also count towards the ancestors of their subjects and divisions.
+    A null subject or division stands for any, including none.
+    """
+    subject = djm.ForeignKey(
+        Subject,
+        null=True,
+        on_delete=djm.CASCADE,
+        related_name='event_rollups',
+        verbose_name=_('subject'))
+    division = djm.ForeignKey(
+        location.Division,
+        null=True,
+        on_delete=djm.CASCADE,
+        related_name='event_rollups',
+        verbose_name=_('territorial division'))
+    granularity = djm.IntegerField(choices=RollupGranularity.CHOICES, verbose_name=_('granularity'))
+    bucket = djm.DateField(verbose_name=_('bucket'))
+    count = djm.IntegerField(default=0, verbose_name=_('count'))
+
+    def __str__(self):
+        return f"{self.count} events in {self.bucket}"
+
+    class Meta:
+        verbose_name = _('event rollup')
+        verbose_name_plural = _('event rollups')
+        constraints = [
+            djm.UniqueConstraint(
+                fields=['subject', 'division', 'granularity', 'bucket'],
+                name='fons_eventrollup_key',
+                nulls_distinct=False),
+        ]
@@ -0,0 +1,41 @@
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+
+from candelabrus.cache import version
+from fons import models as m
+
+# Coordinates get rounded to this many decimals (about a kilometer) so that nearby requests share cache entries
+PRECISION = 2
+MAX_LIMIT = 50
+
+
+def nearest(latitude, longitude, language, limit=10, max_distance=None, subject=None, start=None, end=None):
+    """
+    Cached events closest to the given coordinates, as compact [id, latitude, longitude, distance, start, title] rows.
+    Distances are in meters and measured from the coordinates once rounded to PRECISION.
+    Entries get discarded whenever an event, its translations or its subjects change.
+    """
+    latitude, longitude = round(latitude, PRECISION), round(longitude, PRECISION)
+    limit = max(1, min(limit, MAX_LIMIT))
+    key = (f'fons:nearby:{version("fons:nearby")}:{language}:{latitude}:{longitude}:{limit}:{max_distance}:'
+           f'{getattr(subject, "pk", None)}:{start and start.isoformat()}:{end and end.isoformat()}')
+    rows = cache.get(key)
+    if rows is None:
+        events = m.Event.objects.with_localizations()
+        if subject is not None:
+            events = events.under_subject(subject)
+        if start is not None or end is not None:
+            events = events.overlapping(start, end)
+        rows = []
+        for event in events.nearest(Point(longitude, latitude, srid=4326), limit, max_distance):
+            localization = event.localization(language)
+            rows.append([
+                event.id,
+                round(event.location.y, 5),
+                round(event.location.x, 5),
+                round(event.distance),
+                event.start.isoformat(),
+                localization.title if localization else None,
+            ])
+        cache.set(key, rows, None)
+    return rows
@@ -0,0 +1,227 @@
+"""
+Incremental maintenance of the event histogram rollups (EventRollup).
+Every change to an event or to its subject and division links is applied as the difference between the rollup keys the
+event contributed to before and after the change, in the transaction which made it.
+Cascades signal the same event several times (e.g. once per link and once for the event itself), so the contribution
+taken before the first of those changes is shared until every one of them is done, which keeps them from being counted
+more than once.
+Bulk queryset updates and inserts bypass the signals, and moving a subject or a division under another parent changes
+the ancestors of every event below it; run the rebuild-event-rollups command after those.
+"""
+from collections import Counter
+
+from django.db import connection
+from django.db import models as djm
+
+from fons import models as m
+from location import models as location
+
+_UPSERT_SQL = """
+INSERT INTO fons_eventrollup (subject_id, division_id, granularity, bucket, count)
+SELECT * FROM unnest(%s::integer[], %s::integer[], %s::integer[], %s::date[], %s::integer[])
+ON CONFLICT (subject_id, division_id, granularity, bucket) DO UPDATE SET count = fons_eventrollup.count + EXCLUDED.count
+RETURNING id, count
+"""
+
+# Every event counts once for each of its subject and division ancestors (deduplicated), plus once for the "any" row
+_REBUILD_SQL = """
+WITH subject AS (
+    SELECT DISTINCT link.event_id, ancestor.id AS subject_id
+    FROM fons_eventsubjects link
+    JOIN fons_subject linked ON linked.id = link.subject_id
+    JOIN fons_subject ancestor
+        ON ancestor.tree_id = linked.tree_id AND ancestor.lft <= linked.lft AND ancestor.rght >= linked.rght
+    UNION ALL
+    SELECT id, NULL FROM fons_event
+), division AS (
+    SELECT DISTINCT link.event_id, ancestor.id AS division_id
+    FROM fons_eventdivisions link
+    JOIN location_division linked ON linked.id = link.division_id
+    JOIN location_division ancestor
+        ON ancestor.id = ANY(array_append(string_to_array(trim(BOTH '/' FROM linked.path), '/')::integer[], linked.id))
+    UNION ALL
+    SELECT id, NULL FROM fons_event
+), granularity AS (
+    SELECT * FROM unnest(%s::integer[], %s::text[]) AS granularity(value, unit)
+)
+INSERT INTO fons_eventrollup (subject_id, division_id, granularity, bucket, count)
+SELECT subject.subject_id, division.division_id, granularity.value,
+       date_trunc(granularity.unit, event.start AT TIME ZONE 'UTC')::date, count(*)
+FROM fons_event event
+JOIN subject ON subject.event_id = event.id
+JOIN division ON division.event_id = event.id
+CROSS JOIN granularity
+GROUP BY 1, 2, 3, 4
+"""
+
+
+def contribution(event_id):
+    """Set of (subject, division, granularity, bucket) rollup keys which the stored event counts towards"""
+    start = m.Event.objects.filter(pk=event_id).values_list('start', flat=True).first()
+    if start is None:
+        return set()
+
+    subjects = {None}
+    ancestry = djm.Q()
+    linked = m.Subject.objects.filter(eventsubjects__event_id=event_id).values_list('tree_id', 'lft', 'rght')
+    for tree_id, lft, rght in linked:
+        ancestry |= djm.Q(tree_id=tree_id, lft__lte=lft, rght__gte=rght)
+    if ancestry:
+        subjects.update(m.Subject.objects.filter(ancestry).values_list('id', flat=True))
+
+    divisions = {None}
+    for division in location.Division.objects.filter(eventdivisions__event_id=event_id).only('id', 'path'):
+        divisions.add(division.id)
+        divisions.update(division.ancestor_ids)
+
+    buckets = [
+        (granularity, m.RollupGranularity.bucket(granularity, start))
+        for granularity in m.RollupGranularity.UNITS]
+    return {
+        (subject, division, granularity, bucket)
+        for subject in subjects
+        for division in divisions
+        for granularity, bucket in buckets}
+
+
+def apply(deltas):
+    """Adds the {key: amount} deltas to the rollups, dropping the rows which are left empty"""
+    # A stable order keeps concurrent transactions from locking the same rows in opposite orders
+    keys = sorted((key for key, amount in deltas.items() if amount), key=repr)
+    if not keys:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_UPSERT_SQL, [
+            [key[0] for key in keys],
+            [key[1] for key in keys],
+            [key[2] for key in keys],
+            [key[3] for key in keys],
+            [deltas[key] for key in keys]])
+        empty = [identifier for identifier, count in cursor.fetchall() if count <= 0]
+    if empty:
+        m.EventRollup.objects.filter(id__in=empty).delete()
+
+
+def pending(carrier):
+    """
+    Contributions taken before an operation and still waiting for it to finish, keyed by event.
+    They're kept on the object which carries the operation (the saved instance, the origin of a deletion or the
+    instance of an m2m change), so an operation which fails halfway can't leave them behind for the next one.
+    """
+    if not hasattr(carrier, '_rollup_pending'):
+        carrier._rollup_pending = dict()
+    return carrier._rollup_pending
+
+
+def before(carrier, event_ids):
+    pending_events = pending(carrier)
+    for event_id in event_ids:
+        if event_id in pending_events:
+            pending_events[event_id][1] += 1
+        else:
+            pending_events[event_id] = [contribution(event_id), 1]
+
+
+def after(carrier, event_ids):
+    pending_events = pending(carrier)
+    for event_id in event_ids:
+        entry = pending_events.get(event_id)
+        previous = entry[0] if entry else set()
+        current = contribution(event_id)
+        deltas = Counter()
+        for key in current - previous:
+            deltas[key] += 1
+        for key in previous - current:
+            deltas[key] -= 1
+        apply(deltas)
+        if entry:
+            entry[0] = current
+            entry[1] -= 1
+            if entry[1] == 0:
+                del pending_events[event_id]
+
+
+def on_event_pre_save(instance, raw=False, **kwargs):
+    instance._rollup_pending = dict()
+    if not raw and instance.pk is not None:
+        before(instance, (instance.pk,))
+
+
+def on_event_saved(instance, raw=False, **kwargs):
+    if not raw:
+        after(instance, (instance.pk,))
+
+
+def on_event_pre_delete(instance, origin=None, **kwargs):
+    before(origin or instance, (instance.pk,))
+
+
+def on_event_deleted(instance, origin=None, **kwargs):
+    after(origin or instance, (instance.pk,))
+
+
+def on_link_pre_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_pending = dict()
+    events = set()
+    if not raw:
+        events.add(instance.event_id)
+        if instance.pk is not None:
+            events.update(sender.objects.filter(pk=instance.pk).values_list('event_id', flat=True))
+    instance._rollup_events = events
+    before(instance, events)
+
+
+def on_link_saved(instance, raw=False, **kwargs):
+    if not raw:
+        after(instance, instance._rollup_events)
+
+
+def on_link_pre_delete(instance, origin=None, **kwargs):
+    before(origin or instance, (instance.event_id,))
+
+
+def on_link_deleted(instance, origin=None, **kwargs):
+    after(origin or instance, (instance.event_id,))
+
+
+def on_links_changed(instance, action, reverse, pk_set, **kwargs):
+    # Links are removed through a queryset delete of the through model, whose delete signals account for them
+    if action == 'pre_add':
+        instance._rollup_pending = dict()
+        instance._rollup_events = set(pk_set) if reverse else {instance.pk}
+        before(instance, instance._rollup_events)
+    elif action == 'post_add':
+        after(instance, instance._rollup_events)
+
+
+def rebuild():
+    """Recomputes every rollup from scratch. Returns the amount of rollup rows."""
+    units = m.RollupGranularity.UNITS
+    m.EventRollup.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(_REBUILD_SQL, [list(units), list(units.values())])
+        return cursor.rowcount
+
+
+def histogram(subject=None, division=None, granularity=m.RollupGranularity.YEAR, start=None, end=None):
+    """(bucket, count) pairs, in bucket order, of the events of the subject and division (any when None)"""
+    rollups = m.EventRollup.objects.filter(
+        subject=subject,
+        division=division,
+        granularity=granularity)
+    if start is not None:
+        rollups = rollups.filter(bucket__gte=m.RollupGranularity.bucket(granularity, start))
+    if end is not None:
+        rollups = rollups.filter(bucket__lte=m.RollupGranularity.bucket(granularity, end))
+    return list(rollups.order_by('bucket').values_list('bucket', 'count'))
+
+
+def sparkline(subject=None, division=None, granularity=m.RollupGranularity.YEAR, buckets=40):
+    """The latest histogram buckets, as (bucket, count, percentage of the highest count) triples"""
+    rollups = m.EventRollup.objects \
+        .filter(subject=subject, division=division, granularity=granularity) \
+        .order_by('-bucket') \
+        .values_list('bucket', 'count')[:buckets]
+    rollups = list(reversed(rollups))
+    highest = max((count for _, count in rollups), default=0)
+    return [(bucket, count, round(100 * count / highest)) for bucket, count in rollups]
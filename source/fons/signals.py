@@ -0,0 +1,62 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from candelabrus import cache
+from fons import closure
+from fons import models as m
+from fons import rollups
+from fons import stats
+
+post_save.connect(closure.on_provider_saved, sender=m.SourceProvider)
+pre_delete.connect(closure.on_provider_pre_delete, sender=m.SourceProvider)
+post_delete.connect(closure.on_provider_deleted, sender=m.SourceProvider)
+m2m_changed.connect(closure.on_ownership_changed, sender=m.SourceProvider.parent.through)
+
+pre_save.connect(stats.on_flaw_pre_save, sender=m.SourceFlaw)
+post_save.connect(stats.on_flaw_saved, sender=m.SourceFlaw)
+post_delete.connect(stats.on_flaw_deleted, sender=m.SourceFlaw)
+# Saving a webpage or a media only signals the subclass, but deleting them always deletes (and signals) the source
+for source_model in (m.Source, m.Webpage, m.Media):
+    pre_save.connect(stats.on_source_pre_save, sender=source_model)
+    post_save.connect(stats.on_source_saved, sender=source_model)
+post_delete.connect(stats.on_source_deleted, sender=m.Source)
+
+pre_save.connect(rollups.on_event_pre_save, sender=m.Event)
+post_save.connect(rollups.on_event_saved, sender=m.Event)
+pre_delete.connect(rollups.on_event_pre_delete, sender=m.Event)
+post_delete.connect(rollups.on_event_deleted, sender=m.Event)
+for link_model in (m.EventSubjects, m.EventDivisions):
+    pre_save.connect(rollups.on_link_pre_save, sender=link_model)
+    post_save.connect(rollups.on_link_saved, sender=link_model)
+    pre_delete.connect(rollups.on_link_pre_delete, sender=link_model)
+    post_delete.connect(rollups.on_link_deleted, sender=link_model)
+    m2m_changed.connect(rollups.on_links_changed, sender=link_model)
+
+
+@receiver([post_save, post_delete], sender=m.Subject)
+@receiver([post_save, post_delete], sender=m.LocalizedSubject)
+@receiver([post_save, post_delete], sender=m.EventSubjects)
+@receiver(m2m_changed, sender=m.EventSubjects)
+def invalidate_catalog(**kwargs):
+    cache.bump('fons:catalog')
+
+
+@receiver([post_save, post_delete], sender=m.Event)
+@receiver([post_save, post_delete], sender=m.LocalizedEvent)
+@receiver(m2m_changed, sender=m.Event.children.through)
+def invalidate_event_trees(**kwargs):
+    cache.bump('fons:event-tree')
+
+
+@receiver([post_save, post_delete], sender=m.Event)
+@receiver([post_save, post_delete], sender=m.LocalizedEvent)
+@receiver([post_save, post_delete], sender=m.EventSubjects)
+@receiver(m2m_changed, sender=m.EventSubjects)
+def invalidate_nearby(**kwargs):
+    cache.bump('fons:nearby')
+
+
+@receiver([post_save, post_delete, m2m_changed])
+def invalidate_pages(sender, **kwargs):
+    if sender._meta.app_label == 'fons':
+        cache.bump('page:fons')
@@ -0,0 +1,102 @@
+"""
+Incremental maintenance of the source and provider credibility statistics (SourceStats, ProviderStats).
+Every flaw change is applied as a delta to the counters of its source and of the source provider, with the
+counter rows locked, inside the transaction which changed the flaw.
+Bulk queryset updates bypass the signals; run the rebuild-source-stats command after those.
+"""
+from collections import defaultdict
+
+from django.db.models import Count
+
+from fons import models as m
+
+
+def locked(model, key, create=True):
+    queryset = model.objects.select_for_update()
+    if create:
+        return queryset.get_or_create(pk=key)[0]
+    return queryset.filter(pk=key).first()
+
+
+def count_flaw(source_id, flaw, fallacy_id, verified, amount, create=True):
+    provider_id = m.Source.objects.filter(pk=source_id).values_list('provider_id', flat=True).first()
+    for model, key in ((m.SourceStats, source_id), (m.ProviderStats, provider_id)):
+        if key is None:
+            continue
+        stats = locked(model, key, create)
+        if stats is not None:
+            stats.count(flaw, fallacy_id, verified, amount)
+            stats.save()
+
+
+def on_flaw_pre_save(instance, raw=False, **kwargs):
+    instance._counted = None
+    if not raw and instance.pk is not None:
+        instance._counted = m.SourceFlaw.objects \
+            .filter(pk=instance.pk) \
+            .values_list('source_id', 'flaw', 'fallacy_id', 'verified') \
+            .first()
+
+
+def on_flaw_saved(instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance._counted is not None:
+        count_flaw(*instance._counted, amount=-1)
+    count_flaw(instance.source_id, instance.flaw, instance.fallacy_id, instance.verified, 1)
+
+
+def on_flaw_deleted(instance, **kwargs):
+    # The statistics row is gone already when the flaw is deleted along with its source
+    count_flaw(instance.source_id, instance.flaw, instance.fallacy_id, instance.verified, -1, create=False)
+
+
+def on_source_pre_save(instance, raw=False, **kwargs):
+    instance._counted_provider = None
+    if not raw and instance.pk is not None:
+        instance._counted_provider = m.Source.objects \
+            .filter(pk=instance.pk) \
+            .values_list('provider_id', flat=True) \
+            .first()
+
+
+def on_source_saved(instance, created, raw=False, **kwargs):
+    if raw or (not created and instance._counted_provider == instance.provider_id):
+        return
+    source_stats = m.SourceStats.objects.filter(pk=instance.pk).first() or m.SourceStats()
+    if not created and instance._counted_provider is not None:
+        previous = locked(m.ProviderStats, instance._counted_provider)
+        previous.sources -= 1
+        previous.merge(source_stats, -1)
+        previous.save()
+    current = locked(m.ProviderStats, instance.provider_id)
+    current.sources += 1
+    current.merge(source_stats, 1)
+    current.save()
+
+
+def on_source_deleted(instance, **kwargs):
+    stats = locked(m.ProviderStats, instance.provider_id, create=False)
+    if stats is not None:
+        stats.sources -= 1
+        stats.save()
+
+
+def compute():
+    """Statistics computed from scratch, as unsaved SourceStats and ProviderStats keyed by source and provider"""
+    sources = defaultdict(m.SourceStats)
+    providers = defaultdict(m.ProviderStats)
+    for provider_id, count in m.Source.objects.values_list('provider').annotate(Count('id')):
+        providers[provider_id].sources = count
+    flaws = m.SourceFlaw.objects \
+        .values_list('source_id', 'source__provider_id', 'flaw', 'fallacy_id', 'verified') \
+        .annotate(Count('id'))
+    for source_id, provider_id, flaw, fallacy_id, verified, count in flaws:
+        sources[source_id].count(flaw, fallacy_id, verified, count)
+        providers[provider_id].count(flaw, fallacy_id, verified, count)
+    for source_id, stats in sources.items():
+        stats.source_id = source_id
+    for provider_id, stats in providers.items():
+        stats.provider_id = provider_id
+        stats.verified_flaw_rate = stats.verified_flaws / stats.sources if stats.sources else 0
+    return sources, providers
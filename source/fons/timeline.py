@@ -0,0 +1,40 @@
+from django.core import signing
+from django.utils.dateparse import parse_datetime
+
+from fons import models as m
+
+PAGE_SIZE = 10
+_CURSOR_SALT = 'fons.timeline'
+
+
+def subject_events(subject, descendants=True):
+    """Events of a subject, optionally including those of every subject under it"""
+    if not descendants:
+        return subject.events.all()
+    return m.Event.objects.under_subject(subject)
+
+
+def encode_cursor(event):
+    return signing.dumps([event.start.isoformat(), event.id], salt=_CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """Position which a cursor points to. Raises signing.BadSignature if it was tampered with."""
+    start, identifier = signing.loads(cursor, salt=_CURSOR_SALT)
+    return parse_datetime(start), identifier
+
+
+def page(events, cursor=None, size=PAGE_SIZE):
+    """
+    Newest events first, starting after the cursor position.
+    Pages seek through the (start, id) index, so every page costs the same as the first.
+    Returns the events and the cursor of the following page (None at the last page).
+    """
+    events = events.order_by('-start', '-id')
+    if cursor is not None:
+        start, identifier = decode_cursor(cursor)
+        events = events.filter(start__lte=start).exclude(start=start, id__gte=identifier)
+    events = list(events[:size + 1])
+    if len(events) > size:
+        return events[:size], encode_cursor(events[size - 1])
+    return events, None
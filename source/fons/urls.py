@@ -1,7 +1,7 @@
 from django.urls import path
 from django.utils.translation import gettext_lazy as _
 
-from fons import views
+from fons import autocomplete, views
 
 app_name = 'fons'
 
@@ -9,4 +9,9 @@ urlpatterns = [
     path('', views.index, name='index'),
     path(_('catalog'), views.catalog, name='catalog'),
     path(_('subject/<int:identifier>'), views.subject, name='subject'),
+    path(_('subject/<int:identifier>/events'), views.subject_events, name='subject-events'),
+    path(_('events/nearby'), views.nearby, name='nearby'),
+    path(_('events/histogram'), views.histogram, name='histogram'),
+    path('autocomplete/subjects', autocomplete.SubjectAutocomplete.as_view(), name='subject-autocomplete'),
+    path('autocomplete/providers', autocomplete.SourceProviderAutocomplete.as_view(), name='provider-autocomplete'),
 ]
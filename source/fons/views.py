@@ -1,6 +1,15 @@
+from django.core import signing
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
 from django.utils import translation as t
-from django.shortcuts import render
+from django.utils.dateparse import parse_datetime
+from django.shortcuts import get_object_or_404, render
+from fons import catalog as subject_catalog
 from fons import models as m
+from fons import nearby as nearby_events
+from fons import rollups
+from fons import timeline
+from location import models as location
 
 
 def index(request):
@@ -8,18 +17,104 @@ def index(request):
 
 
 def catalog(request):
-    return render(request, 'fons/catalog.html', {'nodes': m.Subject.objects.all()})
+    return render(request, 'fons/catalog.html', {'nodes': subject_catalog.tree(t.get_language())})
 
 
 def subject(request, identifier):
     language = request.GET['l'] if 'l' in request.GET else t.get_language()
-    subject = m.Subject.objects.prefetch_related('localizations__language').get(id=identifier)
-    current_localization = subject.localizations.filter(language__alpha2=language).first()
-    events = subject.events.order_by('start').reverse().all()[:10]
+    subject = get_object_or_404(m.Subject.objects.with_localizations(), id=identifier)
+    current_localization = subject.localization(language)
+    try:
+        events, next_cursor = timeline.page(
+            timeline.subject_events(subject).with_localizations(),
+            cursor=request.GET.get('before'))
+    except signing.BadSignature:
+        return HttpResponseBadRequest()
 
     context = {
         'subject': subject,
         'loc_subject': current_localization,
-        'events': events
+        'events': events,
+        'next_cursor': next_cursor,
+        'sparkline': rollups.sparkline(subject=subject),
     }
     return render(request, 'fons/subject.html', context)
+
+
+def subject_events(request, identifier):
+    subject = get_object_or_404(m.Subject, id=identifier)
+    descendants = request.GET.get('descendants') != '0'
+    try:
+        events, next_cursor = timeline.page(
+            timeline.subject_events(subject, descendants=descendants).with_localizations(),
+            cursor=request.GET.get('before'))
+    except signing.BadSignature:
+        return HttpResponseBadRequest()
+
+    entries = []
+    for event in events:
+        localized = event.localized
+        entries.append({
+            'id': event.id,
+            'start': event.start,
+            'end': event.end,
+            'title': localized.title if localized else None,
+            'description': localized.description if localized else None,
+        })
+    return JsonResponse({'events': entries, 'next': next_cursor})
+
+
+def query_datetime(request, name):
+    """Optional datetime query parameter. Raises ValueError when it is present but unparseable."""
+    if name not in request.GET:
+        return None
+    value = parse_datetime(request.GET[name])
+    if value is None:
+        raise ValueError(f"Bad {name} datetime")
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def query_id(request, name):
+    """Optional id query parameter. Raises ValueError when it is present but not an id."""
+    return int(request.GET[name]) if name in request.GET else None
+
+
+def nearby(request):
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lon'])
+        limit = int(request.GET.get('k', 10))
+        max_distance = float(request.GET['radius']) if 'radius' in request.GET else None
+        start = query_datetime(request, 'since')
+        end = query_datetime(request, 'until')
+        subject_id = query_id(request, 'subject')
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest()
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or (max_distance is not None and not max_distance >= 0):
+        return HttpResponseBadRequest()
+    if start is not None and end is not None and start > end:
+        return HttpResponseBadRequest()
+    subject = get_object_or_404(m.Subject, id=subject_id) if subject_id is not None else None
+
+    events = nearby_events.nearest(
+        latitude, longitude, t.get_language(),
+        limit=limit, max_distance=max_distance, subject=subject, start=start, end=end)
+    return JsonResponse({'events': events})
+
+
+def histogram(request):
+    granularity = request.GET.get('granularity', 'year')
+    granularities = {unit: value for value, unit in m.RollupGranularity.UNITS.items()}
+    try:
+        start = query_datetime(request, 'since')
+        end = query_datetime(request, 'until')
+        granularity = granularities[granularity]
+        subject_id = query_id(request, 'subject')
+        division_id = query_id(request, 'division')
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest()
+    subject = get_object_or_404(m.Subject, id=subject_id) if subject_id is not None else None
+    division = get_object_or_404(location.Division, id=division_id) if division_id is not None else None
+
+    buckets = rollups.histogram(subject, division, granularity, start, end)
+    return JsonResponse({'buckets': [[bucket.isoformat(), count] for bucket, count in buckets]})
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+def create_extensions(using, **kwargs):
+    """PostgreSQL extensions needed by the project indexes, which must exist before any migration creates them"""
+    from django.db import connections
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
 
 
 class LocationConfig(AppConfig):
     name = 'location'
+
+    def ready(self):
+        pre_migrate.connect(create_extensions, sender=self)
+        from location import signals  # noqa: F401
@@ -0,0 +1,62 @@
+from dal import autocomplete
+from django.contrib.postgres.search import TrigramSimilarity
+
+from location import models as m
+
+
+class TrigramAutocomplete(autocomplete.Select2QuerySetView):
+    """
+    Staff only lookup of rows whose name contains the typed text, most similar first.
+    The substring match is served by the trigram index of the name.
+    """
+    model = None
+    paginate_by = 20
+
+    def get_queryset(self):
+        if not self.request.user.is_staff:
+            return self.model.objects.none()
+        queryset = self.scope(self.model.objects.all())
+        if self.q:
+            queryset = queryset \
+                .filter(name__icontains=self.q) \
+                .annotate(similarity=TrigramSimilarity('name', self.q)) \
+                .order_by('-similarity', 'name')
+        else:
+            queryset = queryset.order_by('name')
+        return queryset
+
+    def scope(self, queryset):
+        return queryset
+
+    def parameter(self, name):
+        """A value forwarded by the form, or passed in the query string"""
+        return self.forwarded.get(name) or self.request.GET.get(name) or None
+
+
+class LanguageAutocomplete(TrigramAutocomplete):
+    model = m.Language
+
+
+class TerritoryAutocomplete(TrigramAutocomplete):
+    model = m.Territory
+
+
+class DivisionAutocomplete(TrigramAutocomplete):
+    """Divisions, optionally scoped to a territory (id or alpha2) and to a depth"""
+    model = m.Division
+
+    def scope(self, queryset):
+        queryset = queryset.select_related('territory')
+        territory = self.parameter('territory')
+        if territory is not None:
+            if str(territory).isdigit():
+                queryset = queryset.filter(territory_id=territory)
+            else:
+                queryset = queryset.filter(territory__alpha2=str(territory).upper())
+        depth = self.parameter('depth')
+        if depth is not None and str(depth).isdigit():
+            queryset = queryset.filter(depth=int(depth))
+        return queryset
+
+    def get_result_label(self, result):
+        return f'{result.name} ({result.territory.alpha2}, {result.get_category_display()})'
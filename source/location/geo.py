@@ -0,0 +1,49 @@
+from location import models as location
+
+# Columns loaded for resolved divisions. Geometries are left out as they can be very heavy.
+_COLUMNS = (
+    'id', 'territory_id', 'name', 'abbreviation', 'code', 'depth', 'category', 'parent_id', 'historical', 'path')
+
+# The deepest division covering each point is found through the polygon GiST index (the && bounding box
+# test prefilters candidates before the exact ST_Covers test), then joined with its ancestors by primary key.
+_RESOLVE_SQL = f"""
+WITH point AS (
+    SELECT point.index, ST_SetSRID(ST_MakePoint(point.longitude, point.latitude), 4326)::geography AS geography
+    FROM unnest(%s::float8[], %s::float8[]) WITH ORDINALITY AS point(longitude, latitude, index)
+), deepest AS (
+    SELECT DISTINCT ON (point.index) point.index, division.id, division.path
+    FROM point
+    JOIN location_division division
+        ON division.polygon && point.geography AND ST_Covers(division.polygon, point.geography)
+    WHERE NOT division.historical
+    ORDER BY point.index, division.depth DESC
+)
+SELECT {', '.join(f'division.{column}' for column in _COLUMNS)}, deepest.index AS point_index
+FROM deepest
+JOIN location_division division
+    ON division.id = ANY(array_append(string_to_array(trim(BOTH '/' FROM deepest.path), '/')::integer[], deepest.id))
+ORDER BY deepest.index, division.depth DESC
+"""
+
+
+def resolve_many(points):
+    """
+    Resolves the territorial divisions which contain each of the given points.
+    Returns a list which has, for every point, its deepest containing division followed by its ancestors.
+    Points outside of every known division get an empty list.
+    """
+    points = list(points)
+    resolved = [[] for _ in points]
+    if not points:
+        return resolved
+    divisions = location.Division.objects.raw(
+        _RESOLVE_SQL,
+        [[point.x for point in points], [point.y for point in points]])
+    for division in divisions:
+        resolved[division.point_index - 1].append(division)
+    return resolved
+
+
+def resolve(point):
+    """Deepest division containing the point, followed by its ancestors"""
+    return resolve_many([point])[0]
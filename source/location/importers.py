@@ -0,0 +1,23 @@
+from django.db import transaction
+
+
+def upsert(model, rows, key='alpha2', update_fields=None, batch_size=500):
+    """
+    Inserts the model instances in rows whose key is still unknown to the database.
+    When update_fields is given, the instances which already exist get those fields refreshed.
+    Returns a (created, updated) tuple with the row counts.
+    """
+    rows = {getattr(row, key): row for row in rows}
+    with transaction.atomic():
+        existing = dict(model.objects.filter(**{f'{key}__in': list(rows)}).values_list(key, 'id'))
+        missing = [row for value, row in rows.items() if value not in existing]
+        model.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+
+        updated = []
+        if update_fields:
+            for value, identifier in existing.items():
+                row = rows[value]
+                row.id = identifier
+                updated.append(row)
+            model.objects.bulk_update(updated, update_fields, batch_size=batch_size)
+    return len(missing), len(updated)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from location import models as location
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the materialized ancestor path of every territorial division'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        divisions = location.Division.objects.order_by('depth').only('id', 'parent_id', 'path')
+        paths = dict()
+        changed = []
+        for division in divisions.iterator():
+            parent_path = paths.get(division.parent_id)
+            path = '/' if division.parent_id is None else f'{parent_path}{division.parent_id}/'
+            paths[division.id] = path
+            if division.path != path:
+                division.path = path
+                changed.append(division)
+
+        with transaction.atomic():
+            location.Division.objects.bulk_update(changed, ['path'], batch_size=options['batch_size'])
+        print(f"{len(changed)} division paths updated, {len(paths) - len(changed)} already up to date")
@@ -0,0 +1,76 @@
+import os
+from collections import Counter
+from django.contrib.gis.gdal import DataSource
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from location import models as location
+
+_UPDATE_SQL = """
+UPDATE location_division AS division
+SET polygon = ST_Multi(geometry.shape)::geography,
+    coordinates = ST_PointOnSurface(geometry.shape)::geography
+FROM (
+    SELECT feature.id, ST_GeomFromWKB(feature.wkb, 4326) AS shape
+    FROM unnest(%s::integer[], %s::bytea[]) AS feature(id, wkb)
+) AS geometry
+WHERE division.id = geometry.id
+"""
+
+
+class Command(BaseCommand):
+    help = 'Loads territorial division boundaries from a GeoJSON file or a shapefile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='+', type=str)
+        parser.add_argument('alpha2', nargs='+', type=str)
+        parser.add_argument('--code-field', default='code', help='Feature attribute with the division code')
+        parser.add_argument('--depth', type=int, help='Only match divisions with this depth')
+        parser.add_argument('--layer', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        file = options['file'][0]
+        alpha2 = options['alpha2'][0]
+        code_field = options['code_field']
+        batch_size = options['batch_size']
+
+        if not os.path.isfile(file):
+            print("Bad file path.")
+            exit(-1)
+
+        divisions = location.Division.objects.filter(territory__alpha2=alpha2)
+        if options['depth'] is not None:
+            divisions = divisions.filter(depth=options['depth'])
+        codes = dict()
+        ambiguous = set()
+        for identifier, code in divisions.values_list('id', 'code'):
+            if code in codes:
+                ambiguous.add(code)
+            codes[code] = identifier
+
+        stats = Counter()
+        batch = []
+        # OGR reads features one at a time, so the layer is never fully loaded
+        for feature in DataSource(file)[options['layer']]:
+            code = str(feature.get(code_field))
+            if code not in codes or code in ambiguous:
+                stats['ambiguous' if code in ambiguous else 'unmatched'] += 1
+                continue
+            geometry = feature.geom
+            geometry.transform(4326)
+            batch.append((codes[code], bytes(geometry.wkb)))
+            if len(batch) >= batch_size:
+                stats['updated'] += self.update(batch)
+                batch = []
+        if batch:
+            stats['updated'] += self.update(batch)
+
+        print(f"{stats['updated']} divisions updated, {stats['unmatched']} features unmatched, "
+              f"{stats['ambiguous']} features with an ambiguous code")
+
+    @staticmethod
+    def update(batch):
+        identifiers, geometries = zip(*batch)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(_UPDATE_SQL, [list(identifiers), list(geometries)])
+            return cursor.rowcount
@@ -1,6 +1,8 @@
 import os
 import csv
+from collections import Counter
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from location import models as location
 
 
@@ -20,12 +22,13 @@ class Command(BaseCommand):
             exit(-1)
 
         territory = location.Territory.objects.get(alpha2=alpha2)
+
+        # Every division that the file describes, keyed by (category, code, depth, parent key).
+        # Regions have no code in the CAOP, so their name is used in its place.
+        nodes = dict()
         with open(file) as file:
             reader = csv.reader(file)
             next(reader)
-            regions = dict()
-            districts = dict()
-            municipalities = dict()
             for dicofre, region_name, district_name, municipality_name, parish_name, _ in reader:
                 parish_name: str = parish_name.replace('união das freguesias de ', '')
                 district_code = dicofre[0:2]
@@ -35,109 +38,67 @@ class Command(BaseCommand):
                 # Region, exclusive to the archipelagos
                 island = district_name.startswith('ilha')
                 if island:
-                    if region_name in regions:
-                        region = regions[region_name]
-                    else:
-                        region = location.Division.objects.filter(
-                            category=location.DivisionType.AUTONOMOUS_REGION,
-                            name=region_name,
-                            territory=territory,
-                            depth=depth,
-                            parent=None
-                        ).first()
-                        if region is None:
-                            region = location.Division(
-                                category=location.DivisionType.AUTONOMOUS_REGION,
-                                name=region_name,
-                                depth=depth,
-                                territory=territory)
-                            region.save()
-                            print(f"Created autonomous region {region_name}")
-                        regions[region_name] = region
+                    region = (location.DivisionType.AUTONOMOUS_REGION, region_name, depth, None)
+                    nodes.setdefault(region, region_name)
                     depth += 1
                 else:
                     region = None
 
                 # District or island
-                if district_code in districts:
-                    district = districts[district_code]
-                elif island:
-                    district = location.Division.objects.filter(
-                        category=location.DivisionType.ISLAND,
-                        territory=territory,
-                        depth=depth,
-                        code=district_code,
-                        parent=region
-                    ).first()
-                    if district is None:
-                        district = location.Division(
-                            category=location.DivisionType.ISLAND,
-                            name=district_name,
-                            code=district_code,
-                            depth=depth,
-                            territory=territory,
-                            parent=region)
-                        district.save()
-                        print(f"Created island {district} in {region}")
-                    districts[district_code] = district
-                else:
-                    district = location.Division.objects.filter(
-                        category=location.DivisionType.DISTRICT,
-                        territory=territory,
-                        depth=depth,
-                        code=district_code,
-                        parent=None
-                    ).first()
-                    if district is None:
-                        district = location.Division(
-                            category=location.DivisionType.DISTRICT,
-                            name=district_name,
-                            code=district_code,
-                            depth=depth,
-                            territory=territory)
-                        district.save()
-                        print(f"Created district {district}")
-                    districts[district_code] = district
+                category = location.DivisionType.ISLAND if island else location.DivisionType.DISTRICT
+                district = (category, district_code, depth, region)
+                nodes.setdefault(district, district_name)
                 depth += 1
 
                 # Municipality, always exists within districts or islands
-                if municipality_code in municipalities:
-                    municipality = municipalities[municipality_code]
-                else:
-                    municipality = location.Division.objects.filter(
-                        category=location.DivisionType.MUNICIPALITY,
-                        code=municipality_code,
-                        depth=depth,
-                        parent=district,
-                        territory=territory
-                    ).first()
-                    if municipality is None:
-                        municipality = location.Division(
-                            category=location.DivisionType.MUNICIPALITY,
-                            name=municipality_name,
-                            code=municipality_code,
-                            depth=depth,
-                            parent=district,
-                            territory=territory)
-                        municipality.save()
-                        # print(f"Created municipality {municipality}")
-                    municipalities[municipality_code] = municipality
+                municipality = (location.DivisionType.MUNICIPALITY, municipality_code, depth, district)
+                nodes.setdefault(municipality, municipality_name)
                 depth += 1
 
                 # Parish, highest division depth
-                parish = location.Division.objects.filter(
-                    category=location.DivisionType.PARISH,
-                    code=dicofre,
-                    depth=depth,
-                    parent=municipality,
-                    territory=territory
-                ).first()
-                if parish is None:
-                    parish = location.Division(
-                        name=parish_name,
-                        code=dicofre,
-                        depth=depth,
-                        parent=municipality,
-                        category=location.DivisionType.PARISH,
-                        territory=territory)
-                    parish.save()
+                parish = (location.DivisionType.PARISH, dicofre, depth, municipality)
+                nodes.setdefault(parish, parish_name)
+
+        created = Counter()
+        skipped = Counter()
+        with transaction.atomic():
+            existing = dict()
+            divisions = location.Division.objects \
+                .filter(territory=territory) \
+                .only('id', 'category', 'code', 'name', 'depth', 'parent_id', 'path')
+            for division in divisions:
+                key = division.code if division.category != location.DivisionType.AUTONOMOUS_REGION else division.name
+                existing[(division.category, key, division.depth, division.parent_id)] = division
+
+            # Parents always have a lower depth than their children, so every depth can be
+            # created at once as long as the previous one has already been resolved.
+            resolved = dict()
+            for depth in sorted({node[2] for node in nodes}):
+                pending = []
+                for node, name in nodes.items():
+                    category, code, node_depth, parent_node = node
+                    if node_depth != depth:
+                        continue
+                    parent = None if parent_node is None else resolved[parent_node]
+                    division = existing.get((category, code, depth, None if parent is None else parent.id))
+                    if division is None:
+                        division = location.Division(
+                            category=category,
+                            name=name,
+                            code='' if category == location.DivisionType.AUTONOMOUS_REGION else code,
+                            depth=depth,
+                            parent=parent,
+                            path=location.Division.child_path(parent),
+                            territory=territory)
+                        pending.append((node, division))
+                        created[category] += 1
+                    else:
+                        resolved[node] = division
+                        skipped[category] += 1
+                location.Division.objects.bulk_create([division for _, division in pending])
+                for node, division in pending:
+                    resolved[node] = division
+
+        for category, label in location.DivisionType.CHOICES:
+            if created[category] or skipped[category]:
+                print(f"{label}: {created[category]} created, {skipped[category]} skipped")
@@ -2,6 +2,7 @@ import os
 import csv
 from django.core.management.base import BaseCommand
 from location import models as location
+from location.importers import upsert
 
 
 class Command(BaseCommand):
@@ -9,6 +10,7 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('file', nargs='+', type=str)
+        parser.add_argument('--update', action='store_true', help='Refresh the names of existing languages')
 
     def handle(self, *args, **options):
         file = options['file'][0]
@@ -20,6 +22,10 @@ class Command(BaseCommand):
         with open(file) as file:
             reader = csv.reader(file)
             next(reader)
-            for a3, a2, name in reader:
-                if not location.Language.objects.filter(alpha2=a2).exists():
-                    location.Language(name=name, alpha2=a2, alpha3=a3).save()
+            languages = [location.Language(name=name, alpha2=a2, alpha3=a3) for a3, a2, name in reader]
+
+        created, updated = upsert(
+            location.Language,
+            languages,
+            update_fields=['name'] if options['update'] else None)
+        print(f"{created} languages created, {updated} updated")
@@ -0,0 +1,103 @@
+import os
+import csv
+import itertools
+from collections import Counter
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from location import models as location
+
+# UN/LOCODE subdivision types which do not fall back to a region
+CATEGORIES = {
+    'parish': location.DivisionType.PARISH,
+    'partish': location.DivisionType.PARISH,
+    'district': location.DivisionType.DISTRICT,
+    'district council area': location.DivisionType.DISTRICT,
+    'capital district': location.DivisionType.DISTRICT,
+    'federal district': location.DivisionType.DISTRICT,
+    'autonomous district': location.DivisionType.DISTRICT,
+    'municipality': location.DivisionType.MUNICIPALITY,
+    'district municipality': location.DivisionType.MUNICIPALITY,
+    'city municipality': location.DivisionType.MUNICIPALITY,
+    'special municipality': location.DivisionType.MUNICIPALITY,
+    'autonomous municipality': location.DivisionType.MUNICIPALITY,
+    'autonomous region': location.DivisionType.AUTONOMOUS_REGION,
+    'autonomous republic': location.DivisionType.AUTONOMOUS_REGION,
+    'autonomous province': location.DivisionType.AUTONOMOUS_REGION,
+    'special administrative region': location.DivisionType.AUTONOMOUS_REGION,
+    'island': location.DivisionType.ISLAND,
+    'island council': location.DivisionType.ISLAND,
+    'group of islands': location.DivisionType.ISLAND,
+    'islands/groups of islands': location.DivisionType.ISLAND,
+    'chains (of islands)': location.DivisionType.ISLAND,
+    'administrative atoll': location.DivisionType.ISLAND,
+}
+
+
+class Command(BaseCommand):
+    help = 'Creates the first level of territorial divisions from the UN/LOCODE subdivisions csv file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='+', type=str)
+        parser.add_argument('--territory', action='append', help='Alpha2 of a territory to import (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be created without writing')
+
+    def handle(self, *args, **options):
+        file = options['file'][0]
+        territories = {alpha2.upper() for alpha2 in options['territory'] or []}
+        batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        self.created = Counter()
+        self.skipped = Counter()
+
+        if not os.path.isfile(file):
+            print("Bad file path.")
+            exit(-1)
+
+        # The file is sorted by country, so each country is a contiguous group of rows
+        with open(file, encoding='latin-1') as file:
+            reader = csv.reader(file)
+            batch = []
+            for alpha2, rows in itertools.groupby(reader, key=lambda row: row[0]):
+                if territories and alpha2 not in territories:
+                    continue
+                batch.extend(rows)
+                if len(batch) >= batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+
+        for alpha2 in sorted(self.created.keys() | self.skipped.keys()):
+            print(f"{alpha2}: {self.created[alpha2]} created, {self.skipped[alpha2]} skipped")
+        if self.dry_run:
+            print("Dry run, nothing was written.")
+
+    def import_batch(self, rows):
+        alpha2s = {row[0] for row in rows}
+        territories = {
+            territory.alpha2: territory
+            for territory in location.Territory.objects.filter(alpha2__in=alpha2s, enabled=True)}
+        existing = set(location.Division.objects
+                       .filter(territory__in=territories.values(), depth=0)
+                       .values_list('territory__alpha2', 'code'))
+
+        divisions = []
+        for alpha2, code, name, category in rows:
+            if alpha2 not in territories:
+                continue
+            if (alpha2, code) in existing:
+                self.skipped[alpha2] += 1
+                continue
+            existing.add((alpha2, code))
+            divisions.append(location.Division(
+                territory=territories[alpha2],
+                name=name.strip(),
+                code=code,
+                depth=0,
+                category=CATEGORIES.get(' '.join(category.lower().split()), location.DivisionType.REGION)))
+            self.created[alpha2] += 1
+
+        if not self.dry_run:
+            with transaction.atomic():
+                location.Division.objects.bulk_create(divisions)
@@ -2,12 +2,15 @@ import os
 import csv
 from django.core.management.base import BaseCommand
 from location import models as location
+from location.importers import upsert
+
 
 class Command(BaseCommand):
     help = 'Creates territory database from a ISO 3166-1 csv file'
 
     def add_arguments(self, parser):
         parser.add_argument('file', nargs='+', type=str)
+        parser.add_argument('--update', action='store_true', help='Refresh the names of existing territories')
 
     def handle(self, *args, **options):
         file = options['file'][0]
@@ -19,6 +22,12 @@ class Command(BaseCommand):
         with open(file) as file:
             reader = csv.reader(file)
             next(reader)
-            for name, a2, a3, code, _, _, _, _, _, _, _ in reader:
-                if not location.Territory.objects.filter(alpha2=a2).exists():
-                    location.Territory(name=name, alpha2=a2, alpha3=a3, code=code).save()
+            territories = [
+                location.Territory(name=name, alpha2=a2, alpha3=a3, code=code)
+                for name, a2, a3, code, _, _, _, _, _, _, _ in reader]
+
+        created, updated = upsert(
+            location.Territory,
+            territories,
+            update_fields=['name'] if options['update'] else None)
+        print(f"{created} territories created, {updated} updated")
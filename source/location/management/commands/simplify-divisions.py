@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from candelabrus import cache
+from location import models as location
+
+
+class Command(BaseCommand):
+    help = 'Precomputes the simplified division polygons which are served to maps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--territory', action='append', help='Alpha2 of a territory to simplify (repeatable)')
+
+    def handle(self, *args, **options):
+        requested = {alpha2.upper() for alpha2 in options['territory'] or []}
+        territories = dict(location.Territory.objects
+                           .filter(alpha2__in=requested)
+                           .values_list('alpha2', 'id'))
+        unknown = requested - territories.keys()
+        if unknown:
+            print(f"Unknown territories: {', '.join(sorted(unknown))}")
+            exit(-1)
+        territories = list(territories.values())
+        condition = 'AND territory_id = ANY(%s)' if requested else ''
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for tier, (_, tolerance, _) in enumerate(location.SimplificationTier.TIERS):
+                cursor.execute(
+                    f"""
+                    INSERT INTO location_simplifieddivision (division_id, tier, polygon)
+                    SELECT id, %s, ST_Multi(ST_SimplifyPreserveTopology(polygon::geometry, %s))
+                    FROM location_division
+                    WHERE polygon IS NOT NULL {condition}
+                    ON CONFLICT (tier, division_id) DO UPDATE SET polygon = EXCLUDED.polygon
+                    """,
+                    [tier, tolerance, territories] if requested else [tier, tolerance])
+                print(f"Tier {tier}: {cursor.rowcount} polygons simplified with a {tolerance}° tolerance")
+        cache.bump('location:tiles')
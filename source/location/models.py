@@ -1,5 +1,7 @@
 from django.db import models as djm
 from django.contrib.gis.db import models as gis
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import functions as f
 from django.utils.translation import gettext_lazy as _
 
 
@@ -34,6 +36,26 @@ class DivisionType:
     )
 
 
+class SimplificationTier:
+    """Precision tiers of the simplified division geometries, chosen by map zoom level"""
+    # (Minimum zoom, simplification tolerance in degrees, GeoJSON coordinate decimals)
+    TIERS = (
+        (0, 0.05, 2),
+        (6, 0.01, 3),
+        (9, 0.001, 4),
+        (12, 0.0001, 5),
+    )
+
+    @staticmethod
+    def for_zoom(zoom):
+        return max(tier for tier, (min_zoom, _, _) in enumerate(SimplificationTier.TIERS) if zoom >= min_zoom)
+
+
+def trigram_index(field, name):
+    """GIN trigram index which serves case insensitive substring lookups (icontains) over a text field"""
+    return GinIndex(OpClass(f.Upper(field), name='gin_trgm_ops'), name=name)
+
+
 class Territory(djm.Model):
     """
     The biggest (usually continuous) territory that a sovereign state has.
@@ -53,6 +75,17 @@ class Territory(djm.Model):
 
     class Meta:
         verbose_name_plural = 'Territories'
+        indexes = [trigram_index('name', 'location_territory_name_trgm')]
+
+
+class DivisionQuerySet(djm.QuerySet):
+    def descendants_of(self, division):
+        """Every division within the given one, at any depth"""
+        return self.filter(path__startswith=division.lineage)
+
+    def ancestors_of(self, division):
+        """Every division which includes the given one, from the lowest depth to the highest"""
+        return self.filter(id__in=division.ancestor_ids).order_by('depth')
 
 
 class Division(djm.Model):
@@ -67,9 +100,48 @@ class Division(djm.Model):
     category = djm.IntegerField(choices=DivisionType.CHOICES)
     parent = djm.ForeignKey('self', on_delete=djm.CASCADE, null=True, blank=True)  # Lower depth division which includes
     historical = djm.BooleanField(default=False)  # No longer exists
+    # Materialized identifiers of the ancestors, from the lowest depth to the parent (eg. "/4/17/")
+    path = djm.CharField(max_length=255, default='/', db_index=True, editable=False)
+
+    objects = DivisionQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def child_path(parent):
+        """Path that the children of parent have"""
+        return '/' if parent is None else parent.lineage
+
+    @property
+    def lineage(self):
+        """Path prefix shared by every descendant of this division"""
+        return f'{self.path}{self.id}/'
+
+    @property
+    def ancestor_ids(self):
+        return [int(identifier) for identifier in self.path.split('/') if identifier]
+
+    def save(self, *args, **kwargs):
+        path = Division.child_path(self.parent)
+        moved = self.id is not None and path != self.path
+        old_lineage = self.lineage
+        self.path = path
+        super().save(*args, **kwargs)
+        if moved:
+            Division.objects.filter(path__startswith=old_lineage).update(
+                path=f.Concat(djm.Value(self.lineage), f.Substr('path', len(old_lineage) + 1)))
+
     class Meta:
         unique_together = [('territory', 'name', 'depth', 'parent'), ('territory', 'abbreviation', 'depth')]
+        indexes = [trigram_index('name', 'location_division_name_trgm')]
+
+
+class SimplifiedDivision(djm.Model):
+    """A precomputed lighter version of a division polygon, suitable for maps at a given zoom level"""
+    division = djm.ForeignKey(Division, on_delete=djm.CASCADE, related_name='simplifications')
+    tier = djm.IntegerField()  # Index of the SimplificationTier
+    polygon = gis.MultiPolygonField()  # Planar geometry, cheaper to intersect than a geography
+
+    class Meta:
+        unique_together = [('tier', 'division')]
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from candelabrus import cache
+from location import models as m
+
+
+@receiver([post_save, post_delete], sender=m.Division)
+@receiver([post_save, post_delete], sender=m.SimplifiedDivision)
+def invalidate_tiles(**kwargs):
+    cache.bump('location:tiles')
@@ -0,0 +1,11 @@
+from django.urls import path
+from location import autocomplete, views
+
+app_name = 'location'
+
+urlpatterns = [
+    path('divisions/<int:zoom>/<int:x>/<int:y>.geojson', views.division_tile, name='division-tile'),
+    path('autocomplete/languages', autocomplete.LanguageAutocomplete.as_view(), name='language-autocomplete'),
+    path('autocomplete/territories', autocomplete.TerritoryAutocomplete.as_view(), name='territory-autocomplete'),
+    path('autocomplete/divisions', autocomplete.DivisionAutocomplete.as_view(), name='division-autocomplete'),
+]
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import math
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotModified
+
+from candelabrus.cache import version
+from location import models as m
+
+# Deepest zoom level served. Deeper tiles wouldn't get any more detail from the finest simplification tier.
+MAX_ZOOM = 22
+
+
+def tile_bounds(zoom, x, y):
+    """Longitude/latitude bounding box of a slippy map tile"""
+    tiles = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return x / tiles * 360 - 180, latitude(y + 1), (x + 1) / tiles * 360 - 180, latitude(y)
+
+
+def division_tile(request, zoom, x, y):
+    if zoom > MAX_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+        return HttpResponseBadRequest()
+    try:
+        depth = int(request.GET['depth']) if 'depth' in request.GET else None
+    except ValueError:
+        return HttpResponseBadRequest()
+    key = f'location:tile:{version("location:tiles")}:{zoom}:{x}:{y}:{depth}'
+    tile = cache.get(key)
+    if tile is None:
+        tier = m.SimplificationTier.for_zoom(zoom)
+        _, _, precision = m.SimplificationTier.TIERS[tier]
+        divisions = m.SimplifiedDivision.objects \
+            .filter(tier=tier, polygon__bboverlaps=Polygon.from_bbox(tile_bounds(zoom, x, y))) \
+            .annotate(geojson=AsGeoJSON('polygon', precision=precision)) \
+            .values_list('division_id', 'division__name', 'division__depth', 'division__category', 'geojson')
+        if depth is not None:
+            divisions = divisions.filter(division__depth=depth)
+        # The geometries come serialized from the database, so they're spliced in rather than re-encoded
+        features = ','.join(
+            f'{{"type":"Feature","id":{identifier},"geometry":{geojson},'
+            f'"properties":{{"name":{json.dumps(name)},"depth":{division_depth},"category":{category}}}}}'
+            for identifier, name, division_depth, category, geojson in divisions)
+        payload = f'{{"type":"FeatureCollection","features":[{features}]}}'.encode()
+        tile = (f'"{hashlib.md5(payload).hexdigest()}"', payload)
+        cache.set(key, tile, None)
+
+    etag, payload = tile
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload, content_type='application/geo+json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
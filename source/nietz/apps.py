@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class NietzConfig(AppConfig):
     name = 'nietz'
+
+    def ready(self):
+        from nietz import signals  # noqa: F401
@@ -0,0 +1,27 @@
+FALLBACK_LANGUAGE = 'en'
+
+
+def best_localization(localizations, language):
+    """Localization in the given language, else in the fallback language, else None"""
+    fallback = None
+    for localization in localizations:
+        if localization.language.alpha2 == language:
+            return localization
+        if localization.language.alpha2 == FALLBACK_LANGUAGE:
+            fallback = localization
+    return fallback
+
+
+class FallacyGraph:
+    """A fallacy with its neighbourhood, each resolved to the best available localization"""
+
+    def __init__(self, fallacy, languages, categories, examples, children, related, language):
+        self.fallacy = fallacy
+        self.languages = languages
+        self.is_translated = fallacy.language.alpha2 == language
+        self.categories = categories
+        self.examples = examples
+        self.children = [child for child in children if child.language.alpha2 == language]
+        self.untranslated_children = [child for child in children if child.language.alpha2 != language]
+        self.related = [neighbour for neighbour in related if neighbour.language.alpha2 == language]
+        self.untranslated_related = [neighbour for neighbour in related if neighbour.language.alpha2 != language]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from nietz import models as m
+
+
+class Command(BaseCommand):
+    help = 'Re-renders the stored HTML of every Markdown field (eg. after changing the Markdown extensions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true', help='Only render fields whose source changed')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model in (m.GuideSection, m.LocalizedFallacy, m.FallacyExample):
+            columns = [column for field in model.markdown_fields for column in (f'{field}_rendered', f'{field}_digest')]
+            batch = []
+            rendered = 0
+            for instance in model.objects.order_by('id').iterator(chunk_size=options['batch_size']):
+                if instance.render_markdown(force=not options['stale']):
+                    batch.append(instance)
+                if len(batch) >= options['batch_size']:
+                    rendered += self.flush(model, batch, columns)
+                    batch = []
+            rendered += self.flush(model, batch, columns)
+            print(f"{model._meta.verbose_name_plural}: {rendered} rendered")
+
+    @staticmethod
+    def flush(model, batch, columns):
+        with transaction.atomic():
+            model.objects.bulk_update(batch, columns)
+        return len(batch)
@@ -1,9 +1,12 @@
+import hashlib
+
 from django.db import models as djm
 from django.contrib.postgres import fields as pg
 from markdownx.models import MarkdownxField
 from colorful.fields import RGBColorField
 from markdownx.utils import markdownify
 
+from candelabrus import metrics
 from location import models as location
 
 
@@ -11,20 +14,64 @@ def fallacy_img_path(fallacy, filename):
     return f'nz/f/i/{fallacy.name.replace(" ", "_")}.{filename.split(".")[-1]}'
 
 
-class GuideSection(djm.Model):
+def markdown_digest(source):
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def render(source):
+    with metrics.timed('markdown'):
+        return markdownify(source)
+
+
+class RenderedMarkdown:
+    """
+    Stores the HTML of Markdown fields alongside them.
+    Every field listed in markdown_fields needs a <field>_rendered and a <field>_digest column.
+    """
+    markdown_fields = ()
+
+    def render_markdown(self, force=False):
+        """Renders the fields whose source changed since they were last rendered. Returns the updated columns."""
+        updated = []
+        for field in self.markdown_fields:
+            digest = markdown_digest(getattr(self, field))
+            if force or digest != getattr(self, f'{field}_digest'):
+                setattr(self, f'{field}_rendered', render(getattr(self, field)))
+                setattr(self, f'{field}_digest', digest)
+                updated += [f'{field}_rendered', f'{field}_digest']
+        return updated
+
+    def rendered(self, field):
+        source = getattr(self, field)
+        if markdown_digest(source) != getattr(self, f'{field}_digest'):
+            return render(source)  # Stale, changed without saving through the model
+        return getattr(self, f'{field}_rendered')
+
+    def save(self, *args, **kwargs):
+        updated = self.render_markdown()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']).union(updated)
+        super().save(*args, **kwargs)
+
+
+class GuideSection(RenderedMarkdown, djm.Model):
     language = djm.ForeignKey(location.Language, on_delete=djm.PROTECT)
     name = djm.CharField(max_length=100)
     index = djm.IntegerField()
     content = MarkdownxField()
+    content_rendered = djm.TextField(blank=True, editable=False)
+    content_digest = djm.CharField(max_length=32, blank=True, editable=False)
     # Always points to the english guide section this has been translated from
     parent = djm.ForeignKey('self', on_delete=djm.SET_NULL, null=True, blank=True)
 
+    markdown_fields = ('content',)
+
     def __str__(self):
         return self.name
 
     @property
     def content_html(self):
-        return markdownify(self.content)
+        return self.rendered('content')
 
     class Meta:
         unique_together = [['language', 'index'], ['language', 'name']]
@@ -52,20 +99,24 @@ class Fallacy(djm.Model):
         ordering = ['name']
 
 
-class LocalizedFallacy(djm.Model):
+class LocalizedFallacy(RenderedMarkdown, djm.Model):
     fallacy = djm.ForeignKey(Fallacy, on_delete=djm.PROTECT)
     language = djm.ForeignKey(location.Language, on_delete=djm.PROTECT)
     name = djm.CharField(max_length=50)  # Fallacy name in this locale
     description = djm.CharField(max_length=200)  # A short description in this locale
     explanation = MarkdownxField()  # The full description in this locale
+    explanation_rendered = djm.TextField(blank=True, editable=False)
+    explanation_digest = djm.CharField(max_length=32, blank=True, editable=False)
     sources = pg.ArrayField(djm.URLField(), null=True, blank=True)  # Array with external references to this fallacy
 
+    markdown_fields = ('explanation',)
+
     def __str__(self):
         return f'{self.name} - {self.fallacy.name} ({self.language})'
 
     @property
     def explanation_html(self):
-        return markdownify(self.explanation)
+        return self.rendered('explanation')
 
     class Meta:
         verbose_name_plural = 'localized fallacies'
@@ -73,18 +124,24 @@ class LocalizedFallacy(djm.Model):
         ordering = ['name']
 
 
-class FallacyExample(djm.Model):
+class FallacyExample(RenderedMarkdown, djm.Model):
     parent = djm.ForeignKey(LocalizedFallacy, on_delete=djm.PROTECT, related_name="examples")
     content = MarkdownxField()
+    content_rendered = djm.TextField(blank=True, editable=False)
+    content_digest = djm.CharField(max_length=32, blank=True, editable=False)
     explanation = MarkdownxField()
+    explanation_rendered = djm.TextField(blank=True, editable=False)
+    explanation_digest = djm.CharField(max_length=32, blank=True, editable=False)
+
+    markdown_fields = ('content', 'explanation')
 
     @property
     def content_html(self):
-        return markdownify(self.content)
+        return self.rendered('content')
 
     @property
     def explanation_html(self):
-        return markdownify(self.explanation)
+        return self.rendered('explanation')
 
     class Meta:
         unique_together = ['parent', 'content']
@@ -0,0 +1,21 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from candelabrus import cache
+from nietz import models as m
+
+
+@receiver([post_save, post_delete], sender=m.Fallacy)
+@receiver([post_save, post_delete], sender=m.LocalizedFallacy)
+@receiver([post_save, post_delete], sender=m.FallacyCategory)
+@receiver([post_save, post_delete], sender=m.FallacyExample)
+@receiver(m2m_changed, sender=m.Fallacy.related.through)
+@receiver(m2m_changed, sender=m.Fallacy.categories.through)
+def invalidate_taxonomy(**kwargs):
+    cache.bump('nietz:taxonomy')
+
+
+@receiver([post_save, post_delete, m2m_changed])
+def invalidate_pages(sender, **kwargs):
+    if sender._meta.app_label == 'nietz':
+        cache.bump('page:nietz')
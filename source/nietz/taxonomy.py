@@ -0,0 +1,133 @@
+"""
+In-process snapshots of the fallacy taxonomy.
+Each worker keeps one immutable snapshot per language, rebuilt lazily once the shared 'nietz:taxonomy' cache version
+gets bumped (see nietz.signals). The version needs a cache backend shared between workers to propagate edits.
+"""
+from collections import namedtuple
+
+from django.http import Http404
+
+from candelabrus.cache import version
+from nietz import models as m
+from nietz.graph import FallacyGraph, best_localization
+
+Image = namedtuple('Image', 'url')
+Language = namedtuple('Language', 'alpha2 name')
+Category = namedtuple('Category', 'name color')
+Example = namedtuple('Example', 'content_html explanation_html')
+
+
+class FallacyNode:
+    __slots__ = ('id', 'name', 'image', 'parent', 'categories')
+
+    def __init__(self, fallacy):
+        self.id = fallacy.id
+        self.name = fallacy.name
+        self.image = Image(fallacy.image.url) if fallacy.image else None
+        self.parent = None
+        self.categories = ()
+
+
+class LocalizedNode:
+    __slots__ = ('fallacy', 'language', 'name', 'description', 'explanation_html', 'examples')
+
+    def __init__(self, localization, fallacy, examples):
+        self.fallacy = fallacy
+        self.language = Language(localization.language.alpha2, localization.language.name)
+        self.name = localization.name
+        self.description = localization.description
+        self.explanation_html = localization.explanation_html
+        self.examples = examples
+
+
+class Taxonomy:
+    """Every fallacy resolved to its best localization in a language, along with the taxonomy adjacencies"""
+    __slots__ = ('language', 'version', 'localized', 'languages', 'children', 'related', 'translated', 'untranslated')
+
+    def graph(self, identifier):
+        fallacy = self.localized.get(identifier)
+        if fallacy is None:
+            raise Http404
+        return FallacyGraph(
+            fallacy=fallacy,
+            languages=self.languages[identifier],
+            categories=fallacy.fallacy.categories,
+            examples=fallacy.examples,
+            children=[self.localized[child] for child in self.children.get(identifier, ())],
+            related=[self.localized[related] for related in self.related.get(identifier, ())],
+            language=self.language)
+
+
+def build(language, current_version=None):
+    fallacies = dict()
+    parents = dict()
+    for fallacy in m.Fallacy.objects.all():
+        fallacies[fallacy.id] = FallacyNode(fallacy)
+        parents[fallacy.id] = fallacy.parent_id
+    for fallacy_id, parent_id in parents.items():
+        fallacies[fallacy_id].parent = fallacies.get(parent_id)
+
+    categories = {category.id: Category(category.name, category.color) for category in m.FallacyCategory.objects.all()}
+    fallacy_categories = dict()
+    for fallacy_id, category_id in m.Fallacy.categories.through.objects.values_list('fallacy_id', 'fallacycategory_id'):
+        fallacy_categories.setdefault(fallacy_id, []).append(categories[category_id])
+    for fallacy_id, node_categories in fallacy_categories.items():
+        fallacies[fallacy_id].categories = tuple(node_categories)
+
+    localizations = dict()
+    for localization in m.LocalizedFallacy.objects.select_related('language'):
+        localizations.setdefault(localization.fallacy_id, []).append(localization)
+    best = {
+        fallacy_id: best_localization(candidates, language)
+        for fallacy_id, candidates in localizations.items()}
+    best = {fallacy_id: localization for fallacy_id, localization in best.items() if localization is not None}
+
+    examples = dict()
+    for example in m.FallacyExample.objects.filter(parent__in=best.values()).order_by('id'):
+        examples.setdefault(example.parent_id, []).append(Example(example.content_html, example.explanation_html))
+
+    taxonomy = Taxonomy()
+    taxonomy.language = language
+    taxonomy.version = current_version
+    taxonomy.localized = {
+        fallacy_id: LocalizedNode(localization, fallacies[fallacy_id], tuple(examples.get(localization.id, ())))
+        for fallacy_id, localization in best.items()}
+    taxonomy.languages = {
+        fallacy_id: tuple(Language(localization.language.alpha2, localization.language.name)
+                          for localization in candidates)
+        for fallacy_id, candidates in localizations.items()}
+
+    def by_name(identifiers):
+        return tuple(sorted(
+            (identifier for identifier in identifiers if identifier in taxonomy.localized),
+            key=lambda identifier: taxonomy.localized[identifier].name))
+
+    children = dict()
+    for fallacy_id, parent_id in parents.items():
+        if parent_id is not None:
+            children.setdefault(parent_id, []).append(fallacy_id)
+    taxonomy.children = {parent_id: by_name(identifiers) for parent_id, identifiers in children.items()}
+
+    related = dict()
+    for from_id, to_id in m.Fallacy.related.through.objects.values_list('from_fallacy_id', 'to_fallacy_id'):
+        related.setdefault(from_id, []).append(to_id)
+    taxonomy.related = {fallacy_id: by_name(identifiers) for fallacy_id, identifiers in related.items()}
+
+    nodes = sorted(taxonomy.localized.values(), key=lambda node: node.name)
+    taxonomy.translated = tuple(node for node in nodes if node.language.alpha2 == language)
+    taxonomy.untranslated = tuple(
+        node for node in nodes if node.language.alpha2 != language and node.fallacy.parent is None)
+    return taxonomy
+
+
+_snapshots = dict()
+
+
+def get(language):
+    """Taxonomy snapshot for a language, rebuilt only if it changed since this worker last built it"""
+    current_version = version('nietz:taxonomy')
+    snapshot = _snapshots.get(language)
+    if snapshot is None or snapshot.version != current_version:
+        snapshot = build(language, current_version)
+        _snapshots[language] = snapshot
+    return snapshot
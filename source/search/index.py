@@ -0,0 +1,147 @@
+from collections import namedtuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchVector
+from django.db import transaction
+from django.urls import reverse
+from django.utils import translation as t
+
+from fons import models as fons
+from nietz import models as nietz
+from search import models as m
+
+# PostgreSQL text search configurations of the languages it can stem. Everything else is indexed verbatim.
+CONFIGS = {
+    'da': 'danish',
+    'de': 'german',
+    'en': 'english',
+    'es': 'spanish',
+    'fi': 'finnish',
+    'fr': 'french',
+    'hu': 'hungarian',
+    'it': 'italian',
+    'nl': 'dutch',
+    'no': 'norwegian',
+    'pt': 'portuguese',
+    'ro': 'romanian',
+    'ru': 'russian',
+    'sv': 'swedish',
+    'tr': 'turkish',
+}
+
+Document = namedtuple('Document', 'language title body url')
+
+
+def search_config(alpha2):
+    return CONFIGS.get(alpha2, 'simple')
+
+
+def localized_url(language, name, *args):
+    with t.override(language.alpha2):
+        return reverse(name, args=args)
+
+
+def fallacy_document(localization):
+    return Document(
+        localization.language,
+        localization.name,
+        f'{localization.description}\n{localization.explanation}',
+        localized_url(localization.language, 'nietz:fallacy', localization.fallacy_id))
+
+
+def guide_document(section):
+    return Document(section.language, section.name, section.content, localized_url(section.language, 'nietz:concepts'))
+
+
+def subject_document(localization):
+    return Document(
+        localization.language,
+        localization.name,
+        localization.description,
+        localized_url(localization.language, 'fons:subject', localization.subject_id))
+
+
+def event_document(localization):
+    return Document(localization.language, localization.title, localization.description, None)
+
+
+def citation_document(citation):
+    return Document(citation.source.language, citation.author, citation.content, None)
+
+
+# Indexed models, with the relations their documents need and the function which builds them
+INDEXED = {
+    nietz.LocalizedFallacy: (('language',), fallacy_document),
+    nietz.GuideSection: (('language',), guide_document),
+    fons.LocalizedSubject: (('language',), subject_document),
+    fons.LocalizedEvent: (('language',), event_document),
+    fons.Citation: (('source__language',), citation_document),
+}
+
+
+def vector(config):
+    return SearchVector('title', weight='A', config=config) + SearchVector('body', weight='B', config=config)
+
+
+def entry(instance, content_type):
+    _, document = INDEXED[type(instance)]
+    language, title, body, url = document(instance)
+    return m.SearchEntry(
+        content_type=content_type,
+        object_id=instance.pk,
+        language=language,
+        config=search_config(language.alpha2),
+        title=title[:256],
+        body=body,
+        url=url)
+
+
+def index(instance):
+    """Adds or refreshes the search entry of an indexed object"""
+    content_type = ContentType.objects.get_for_model(instance)
+    new_entry = entry(instance, content_type)
+    with transaction.atomic():
+        m.SearchEntry.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+        new_entry.save()
+        m.SearchEntry.objects.filter(id=new_entry.id).update(vector=vector(new_entry.config))
+
+
+def index_many(model, identifiers):
+    """Adds or refreshes the search entries of the given objects of an indexed model, in bulk"""
+    relations, _ = INDEXED[model]
+    content_type = ContentType.objects.get_for_model(model)
+    with transaction.atomic():
+        m.SearchEntry.objects.filter(content_type=content_type, object_id__in=identifiers).delete()
+        entries = m.SearchEntry.objects.bulk_create([
+            entry(instance, content_type)
+            for instance in model.objects.select_related(*relations).filter(pk__in=identifiers)])
+        for config in {new_entry.config for new_entry in entries}:
+            m.SearchEntry.objects \
+                .filter(id__in=[new_entry.id for new_entry in entries if new_entry.config == config]) \
+                .update(vector=vector(config))
+
+
+def unindex(instance):
+    content_type = ContentType.objects.get_for_model(instance)
+    m.SearchEntry.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+
+def rebuild(batch_size=1000):
+    """Rebuilds the whole search index. Returns the number of indexed objects."""
+    count = 0
+    with transaction.atomic():
+        m.SearchEntry.objects.all().delete()
+        for model, (relations, _) in INDEXED.items():
+            content_type = ContentType.objects.get_for_model(model)
+            batch = []
+            for instance in model.objects.select_related(*relations).iterator(chunk_size=batch_size):
+                batch.append(entry(instance, content_type))
+                if len(batch) >= batch_size:
+                    m.SearchEntry.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            m.SearchEntry.objects.bulk_create(batch)
+            count += len(batch)
+        for config in m.SearchEntry.objects.values_list('config', flat=True).distinct():
+            m.SearchEntry.objects.filter(config=config).update(vector=vector(config))
+    return count
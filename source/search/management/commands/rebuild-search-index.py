@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from search import index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from every indexed object'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        print(f"{index.rebuild(options['batch_size'])} objects indexed")
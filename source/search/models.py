@@ -0,0 +1,28 @@
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models as djm
+from django.utils.translation import gettext_lazy as _
+
+from location import models as location
+
+
+class SearchEntry(djm.Model):
+    """A searchable document, derived from an indexed object in the language it is written in"""
+    content_type = djm.ForeignKey(ContentType, on_delete=djm.CASCADE)
+    object_id = djm.PositiveIntegerField()
+    language = djm.ForeignKey(location.Language, on_delete=djm.CASCADE, verbose_name=_('language'))
+    config = djm.CharField(max_length=32)  # PostgreSQL text search configuration
+    title = djm.CharField(max_length=256, verbose_name=_('title'))
+    body = djm.TextField(verbose_name=_('body'))
+    url = djm.CharField(max_length=256, null=True, blank=True)
+    vector = SearchVectorField(null=True)
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        verbose_name = _('search entry')
+        verbose_name_plural = _('search entries')
+        unique_together = (('content_type', 'object_id'),)
+        indexes = [GinIndex(fields=['vector'], name='search_entry_vector_idx')]
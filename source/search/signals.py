@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+
+from search import index
+
+
+def update_entry(instance, raw=False, **kwargs):
+    if not raw:
+        index.index(instance)
+
+
+def remove_entry(instance, **kwargs):
+    index.unindex(instance)
+
+
+for model in index.INDEXED:
+    post_save.connect(update_entry, sender=model, dispatch_uid=f'search:index:{model._meta.label}')
+    post_delete.connect(remove_entry, sender=model, dispatch_uid=f'search:unindex:{model._meta.label}')
@@ -0,0 +1,25 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.paginator import Paginator
+from django.db.models import F
+from django.shortcuts import render
+from django.utils import translation as t
+
+from search import models as m
+from search.index import search_config
+
+PAGE_SIZE = 20
+
+
+def search(request):
+    terms = request.GET.get('q', '').strip()
+    language = t.get_language()
+    page = None
+    if terms:
+        query = SearchQuery(terms, config=search_config(language), search_type='websearch')
+        entries = m.SearchEntry.objects \
+            .filter(language__alpha2=language, vector=query) \
+            .annotate(rank=SearchRank(F('vector'), query)) \
+            .order_by('-rank', 'id') \
+            .only('title', 'body', 'url')
+        page = Paginator(entries, PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'search/results.html', {'terms': terms, 'page': page})
@@ -11,6 +11,8 @@ with open(CONFIG_PATH) as file:
     locals().update(json.load(file))
 
 INSTALLED_APPS = [
+    'dal',
+    'dal_select2',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -18,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'django_extensions',
     'mptt',
     'django_mptt_admin',
@@ -31,12 +34,15 @@ INSTALLED_APPS = [
     'mereokratos',
     'fons',
     'darwin',
+    'search',
 ]
 
 MIDDLEWARE = [
+    'candelabrus.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    'candelabrus.middleware.PageCacheMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -48,7 +54,7 @@ ROOT_URLCONF = 'urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'candelabrus.templates.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')]
         ,
         'APP_DIRS': True,
@@ -108,6 +114,39 @@ try:
 except NameError:
     DEBUG = False
 
+# Without a configured cache, every worker keeps its own in memory.
+# Configure a shared one (file based, redis or memcached) so that cache invalidations reach every worker.
+try:
+    CACHES
+except NameError:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+try:
+    PAGE_CACHE
+except NameError:
+    PAGE_CACHE = {
+        'NAMESPACES': ['fons', 'nietz', 'dejure', 'darwin', 'mereokratos'],
+        'TIMEOUT': 3600,
+    }
+
+# Per request instrumentation (see candelabrus.metrics), exported at /metrics.
+# Set a DIRECTORY writable by every worker for the export to cover all of them.
+try:
+    METRICS
+except NameError:
+    METRICS = {
+        'ENABLED': False,
+        'QUERY_BUDGET': 50,
+        'LATENCY_BUDGET': 1.0,
+        'DIRECTORY': None,
+        'DUMP_INTERVAL': 10,
+        'ALLOWED_ADDRESSES': ['127.0.0.1'],
+    }
+
 if DEBUG:
     CSRF_COOKIE_SECURE = False
     SESSION_COOKIE_SECURE = False
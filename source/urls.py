@@ -9,6 +9,8 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('markdownx/', include('markdownx.urls')),
     path('admin/', admin.site.urls),
+    path('location/', include('location.urls')),
+    path('metrics', views.metrics, name='metrics'),
 ]
 
 urlpatterns += i18n_patterns(
@@ -17,6 +19,7 @@ urlpatterns += i18n_patterns(
     path('darwin/', include('darwin.urls')),
     path('nietz/', include('nietz.urls')),
     path('mereokratos/', include('mereokratos.urls')),
+    path('search/', include('search.urls')),
 )
 
 if settings.DEBUG: